@@ -101,16 +101,16 @@ def plot_score_heatmap_by_tf_tg(
     max_tfs = min(max_tfs, df[tf_col_name].nunique())
     max_tgs = min(max_tgs, df[tg_col_name].nunique())
 
-    # Limit to top TFs and TGs with the most data
-    pivot_df = df.pivot_table(
+    # Limit to top TFs and TGs with the most data. The totals are aggregated on the long
+    # DataFrame so only the max_tfs x max_tgs block is ever pivoted to a dense matrix
+    top_tfs = df.groupby(tf_col_name)[score_col].sum().nlargest(max_tfs).index
+    top_tgs = df.groupby(tg_col_name)[score_col].sum().nlargest(max_tgs).index
+
+    top_df = df[df[tf_col_name].isin(top_tfs) & df[tg_col_name].isin(top_tgs)]
+    pivot_df = top_df.pivot_table(
         index=tf_col_name, columns=tg_col_name,
         values=score_col, aggfunc='sum'
-    ).fillna(0)
-
-    top_tfs = pivot_df.sum(axis=1).nlargest(max_tfs).index
-    top_tgs = pivot_df.sum(axis=0).nlargest(max_tgs).index
-
-    pivot_df = pivot_df.loc[top_tfs, top_tgs]
+    ).reindex(index=top_tfs, columns=top_tgs).fillna(0)
 
     # Plot heatmap
     plt.figure(figsize=figsize)
@@ -5,14 +5,12 @@ import numpy as np
 import h5py
 import matplotlib.pyplot as plt
 from joblib import Parallel, delayed
-from scipy.sparse import lil_matrix, save_npz
+from scipy.sparse import coo_matrix, save_npz
 from tqdm import tqdm
 import contextlib
 import logging
 from math import ceil
 
-logging.basicConfig(level=logging.INFO, format='%(message)s')
-
 project_dir = "/gpfs/Labs/Uzun/SCRIPTS/PROJECTS/2024.SINGLE_CELL_GRN_INFERENCE.MOELLER/"
 
 # Input files
@@ -23,25 +21,7 @@ hic_data_file = os.path.join(project_dir, "data/Hi-C_data/4DNFITHTURR9.mcool::re
 # Output file
 contact_matrix_file = os.path.join(project_dir, 'dev/notebooks/hic_peak_to_tg.parquet')
 
-logging.info("Loading Cooler")
-clr = cooler.Cooler(hic_data_file)
-
-logging.info("Reading mm10 TSS file")
-mm10_tss = pd.read_csv(
-    gene_tss_bedfile, 
-    sep="\t", 
-    header=None, 
-    index_col=None,
-    names=["chrom", "start", "end", "name", "score", "strand"]
-    )
-mm10_tss.head()
-
-logging.info("Reading ATAC Peaks file")
-atac_peaks = pd.read_parquet(peak_location_file)
-atac_peaks = atac_peaks.rename(columns={"chr":"chrom"})
-atac_peaks['chrom'] = 'chr' + atac_peaks['chrom'].astype(str)
-
-def find_contact_frequency_between_coords(coord1, coord2):
+def find_contact_frequency_between_coords(clr, coord1, coord2):
     bin1 = clr.bins().fetch(coord1).index[0]
     bin2 = clr.bins().fetch(coord2).index[0]
 
@@ -49,83 +29,110 @@ def find_contact_frequency_between_coords(coord1, coord2):
     contact_value = clr.matrix(balance=True)[bin1, bin2].item()
     return contact_value
 
-logging.info("Pre-parsing TSS and peak genomic coordinates")
-mm10_tss["gene_position"] = [
-    f"{c}:{s}-{e}" for c, s, e in zip(mm10_tss["chrom"], mm10_tss["start"], mm10_tss["end"])
-]
-atac_peaks["peak_position"] = [
-    f"{c}:{s}-{e}" for c, s, e in zip(atac_peaks["chrom"], atac_peaks["start"], atac_peaks["end"])
-]
-
-n_peaks = len(atac_peaks)
-n_genes = len(mm10_tss)
-
-# Precompute for fast access
-peak_positions = atac_peaks["peak_position"].tolist()
-peak_chroms = atac_peaks["chrom"].to_numpy()
-peak_starts = atac_peaks["start"].to_numpy()
-peak_pos_to_idx = {pos: i for i, pos in enumerate(peak_positions)}
-
-gene_positions = mm10_tss["gene_position"].tolist()
-gene_pos_to_idx = {pos: j for j, pos in enumerate(gene_positions)}
-
-# Parallel function for each gene
-def process_gene(j, row):
-    local_entries = []
-    gene_chrom = row["chrom"]
-    gene_start = row["start"]
-    gene_pos = row["gene_position"]
-
-    # Mask for peaks within 1Mb and on same chromosome
-    mask = (peak_chroms == gene_chrom) & (np.abs(peak_starts - gene_start) <= 1_000_000)
-    filtered_peaks = atac_peaks[mask]
-
-    for _, peak_row in filtered_peaks.iterrows():
-        peak_pos = peak_row["peak_position"]
-        i = peak_pos_to_idx[peak_pos]
+def find_peaks_near_genes(atac_peaks, mm10_tss, max_distance=1_000_000):
+    # Find the peaks within max_distance of every gene TSS at once, one chromosome at a time, by
+    # binary searching the sorted peak starts instead of masking every peak for each gene
+    peak_starts = atac_peaks["start"].to_numpy()
+    gene_starts = mm10_tss["start"].to_numpy()
+    peak_idx_by_chrom = atac_peaks.groupby("chrom").indices
+    gene_peak_idx = [np.empty(0, dtype=np.int64)] * len(mm10_tss)
+
+    for chrom, gene_rows in mm10_tss.groupby("chrom").indices.items():
+        chrom_peaks = peak_idx_by_chrom.get(chrom)
+        if chrom_peaks is None:
+            continue
+        chrom_peaks = chrom_peaks[np.argsort(peak_starts[chrom_peaks], kind="stable")]
+        chrom_peak_starts = peak_starts[chrom_peaks]
+
+        lo = np.searchsorted(chrom_peak_starts, gene_starts[gene_rows] - max_distance, side="left")
+        hi = np.searchsorted(chrom_peak_starts, gene_starts[gene_rows] + max_distance, side="right")
+        for j, a, b in zip(gene_rows, lo, hi):
+            gene_peak_idx[j] = chrom_peaks[a:b]
+    
+    return gene_peak_idx
+
+# Parallel function for each gene. Only the gene's own peaks are passed in, so each task
+# pickles a few strings rather than the full peak list
+def process_gene(clr, gene_pos, peak_idx, peak_positions):
+    local_peaks = []
+    local_values = []
+    for i, peak_pos in zip(peak_idx, peak_positions):
         try:
-            val = find_contact_frequency_between_coords(peak_pos, gene_pos)
+            val = find_contact_frequency_between_coords(clr, peak_pos, gene_pos)
             if not np.isnan(val) and val > 0:
-                local_entries.append((i, j, val))
+                local_peaks.append(i)
+                local_values.append(val)
         except Exception:
             continue
-    return local_entries
-
-# Run in parallel
-logging.info("Extracting Hi-C contact values between peaks and genes")
-update_interval = ceil(len(mm10_tss) / 100)  # every 1%
-
-results = Parallel(n_jobs=64)(
-    delayed(process_gene)(j, row)
-    for j, row in tqdm(
-        list(mm10_tss.iterrows()),
-        desc="Processing genes",
-        total=len(mm10_tss),
-        miniters=update_interval
+    return np.asarray(local_peaks, dtype=np.int64), np.asarray(local_values, dtype=np.float32)
+
+def main():
+    logging.info("Loading Cooler")
+    clr = cooler.Cooler(hic_data_file)
+
+    logging.info("Reading mm10 TSS file")
+    mm10_tss = pd.read_csv(
+        gene_tss_bedfile, 
+        sep="\t", 
+        header=None, 
+        index_col=None,
+        names=["chrom", "start", "end", "name", "score", "strand"]
+        )
+
+    logging.info("Reading ATAC Peaks file")
+    atac_peaks = pd.read_parquet(peak_location_file)
+    atac_peaks = atac_peaks.rename(columns={"chr":"chrom"})
+    atac_peaks['chrom'] = 'chr' + atac_peaks['chrom'].astype(str)
+
+    logging.info("Pre-parsing TSS and peak genomic coordinates")
+    mm10_tss["gene_position"] = [
+        f"{c}:{s}-{e}" for c, s, e in zip(mm10_tss["chrom"], mm10_tss["start"], mm10_tss["end"])
+    ]
+    atac_peaks["peak_position"] = [
+        f"{c}:{s}-{e}" for c, s, e in zip(atac_peaks["chrom"], atac_peaks["start"], atac_peaks["end"])
+    ]
+
+    n_peaks = len(atac_peaks)
+    n_genes = len(mm10_tss)
+
+    # Precompute for fast access
+    peak_positions = atac_peaks["peak_position"].to_numpy()
+    gene_positions = mm10_tss["gene_position"].tolist()
+
+    logging.info("Finding the peaks within 1Mb of each gene TSS")
+    gene_peak_idx = find_peaks_near_genes(atac_peaks, mm10_tss, max_distance=1_000_000)
+
+    # Run in parallel
+    logging.info("Extracting Hi-C contact values between peaks and genes")
+    update_interval = ceil(n_genes / 100)  # every 1%
+
+    results = Parallel(n_jobs=64)(
+        delayed(process_gene)(clr, gene_pos, peak_idx, peak_positions[peak_idx])
+        for gene_pos, peak_idx in tqdm(
+            zip(gene_positions, gene_peak_idx),
+            desc="Processing genes",
+            total=n_genes,
+            miniters=update_interval
+        )
     )
-)
-
-# Flatten and populate sparse matrix
-logging.info("Creating lil_matrix of the results")
-contact_matrix = lil_matrix((n_peaks, n_genes), dtype=np.float32)
-for triplets in results:
-    for i, j, val in triplets:
-        contact_matrix[i, j] = val
 
-logging.info("Converting to coo matrix")
-contact_matrix = contact_matrix.tocoo()
+    # Build the sparse matrix directly from the concatenated per-gene arrays
+    logging.info("Creating coo_matrix of the results")
+    contact_rows = np.concatenate([peak_idx for peak_idx, _ in results])
+    contact_cols = np.repeat(np.arange(n_genes), [len(peak_idx) for peak_idx, _ in results])
+    contact_values = np.concatenate([values for _, values in results])
+    contact_matrix = coo_matrix((contact_values, (contact_rows, contact_cols)), shape=(n_peaks, n_genes))
 
-atac_peaks["peak_id"] = [
-    f"{c}:{s}-{e}" for c, s, e in zip(atac_peaks["chrom"], atac_peaks["start"], atac_peaks["end"])
-]
+    gene_names = mm10_tss["name"].values
 
-gene_names = mm10_tss["name"].values
-peak_positions = atac_peaks["peak_id"].values
+    contact_df = pd.DataFrame({
+        "peak_id": peak_positions[contact_matrix.row],
+        "target_id": gene_names[contact_matrix.col],
+        "contact_value": contact_matrix.data
+    })
 
-contact_df = pd.DataFrame({
-    "peak_id": peak_positions[contact_matrix.row],
-    "target_id": gene_names[contact_matrix.col],
-    "contact_value": contact_matrix.data
-})
+    contact_df.to_parquet(contact_matrix_file, engine="pyarrow", compression="snappy")
 
-contact_df.to_parquet(contact_matrix_file, engine="pyarrow", compression="snappy")
\ No newline at end of file
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    main()
@@ -1,4 +1,7 @@
 import pandas as pd
+import numpy as np
+import pyarrow as pa
+import pyarrow.csv as pa_csv
 import logging
 import argparse
 import pybedtools
@@ -37,65 +40,81 @@ def parse_args() -> argparse.Namespace:
 
     return args
 
+def write_bed_file(df, bed_path):
+    # Arrow's multithreaded C++ CSV writer avoids pandas' per-cell Python formatting
+    pa_csv.write_csv(
+        pa.Table.from_pandas(df, preserve_index=False),
+        bed_path,
+        write_options=pa_csv.WriteOptions(include_header=False, delimiter="\t", quoting_style="none"),
+    )
+
 def extract_atac_peaks(atac_df, tmp_dir):
-    peak_pos = atac_df["peak_id"].tolist()
+    peak_pos = atac_df["peak_id"].astype(str).reset_index(drop=True)
 
-    peak_df = pd.DataFrame()
-    peak_df["chr"] = [pos.split(":")[0].replace("chr", "") for pos in peak_pos]
-    peak_df["start"] = [int(pos.split(":")[1].split("-")[0]) for pos in peak_pos]
-    peak_df["end"] = [int(pos.split(":")[1].split("-")[1]) for pos in peak_pos]
+    # Split every "chr:start-end" peak ID in one vectorized regex pass
+    peak_df = peak_pos.str.extract(r"^(?P<chr>[^:]+):(?P<start>\d+)-(?P<end>\d+)$")
+    peak_df["chr"] = peak_df["chr"].str.replace("chr", "", regex=False)
+    peak_df["start"] = peak_df["start"].astype(np.int64)
+    peak_df["end"] = peak_df["end"].astype(np.int64)
     peak_df["peak_id"] = peak_pos
-
-    peak_df["chr"] = peak_df["chr"].astype(str)
-    peak_df["start"] = peak_df["start"].astype(int)
-    peak_df["end"] = peak_df["end"].astype(int)
-    peak_df["peak_id"] = peak_df["peak_id"].astype(str)
     
     # Write the peak DataFrame to a file
-    peak_df.to_csv(f"{tmp_dir}/peak_df.bed", sep="\t", header=False, index=False)
+    write_bed_file(peak_df, f"{tmp_dir}/peak_df.bed")
 
 def load_enhancer_database_file(enhancer_db_file, tmp_dir):
-    enhancer_db = pd.read_csv(enhancer_db_file, sep="\t", header=None, index_col=None)
-    enhancer_db = enhancer_db.rename(columns={
-        0 : "chr",
-        1 : "start",
-        2 : "end",
-        3 : "enhancer",
-        4 : "tissue",
-        5 : "R1_value",
-        6 : "R2_value",
-        7 : "R3_value",
-        8 : "score"
-    })
+    # Only the location, enhancer name, and score columns are used, so skip parsing the
+    # tissue and replicate value columns and read the rest with their final dtypes
+    enhancer_db = pd.read_csv(
+        enhancer_db_file, 
+        sep="\t", 
+        header=None, 
+        index_col=None,
+        usecols=[0, 1, 2, 3, 8],
+        names=["chr", "start", "end", "enhancer", "score"],
+        dtype={"chr": str, "start": np.int64, "end": np.int64, "enhancer": str, "score": np.float64},
+    )
     
     # Remove the "chr" before chromosome number
-    enhancer_db["chr"] = enhancer_db["chr"].str.replace("^chr", "", regex=True)
+    enhancer_db["chr"] = enhancer_db["chr"].str.removeprefix("chr")
     
-    # Average the score of an enhancer across all tissues / cell types
-    enhancer_db = enhancer_db.groupby(["chr", "start", "end", "enhancer"], as_index=False)["score"].mean()
-
-    enhancer_db["chr"] = enhancer_db["chr"].astype(str)
-    enhancer_db["start"] = enhancer_db["start"].astype(int)
-    enhancer_db["end"] = enhancer_db["end"].astype(int)
-    enhancer_db["enhancer"] = enhancer_db["enhancer"].astype(str)
+    # Average the score of an enhancer across all tissues / cell types. Each enhancer is
+    # factorized to an integer code so the mean is two weighted bincounts rather than a
+    # groupby over four object-dtype keys
+    key_cols = ["chr", "start", "end", "enhancer"]
+    enhancer_db = enhancer_db[enhancer_db[key_cols].notna().all(axis=1)]
+    codes, enhancers = pd.MultiIndex.from_frame(enhancer_db[key_cols]).factorize()
+    
+    scores = enhancer_db["score"].to_numpy(dtype=np.float64)
+    has_score = ~np.isnan(scores)
+    score_sums = np.bincount(codes[has_score], weights=scores[has_score], minlength=len(enhancers))
+    score_counts = np.bincount(codes[has_score], minlength=len(enhancers))
     
-    enhancer_db = enhancer_db[["chr", "start", "end", "enhancer", "score"]]
+    enhancer_db = enhancers.to_frame(index=False)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        enhancer_db["score"] = score_sums / score_counts
     
     # Write the peak DataFrame to a file
-    enhancer_db.to_csv(f"{tmp_dir}/enhancer.bed", sep="\t", header=False, index=False)
+    write_bed_file(enhancer_db, f"{tmp_dir}/enhancer.bed")
 
 def find_peaks_in_known_enhancer_region(peak_bed, enh_bed):
     # 4) Find peaks that overlap with known enhancer locations from EnhancerDB
     logging.info("Locating peaks that overlap with known enhancer locations from EnhancerDB")
-    peak_enh_overlap = peak_bed.intersect(enh_bed, wa=True, wb=True)
+    # Both BED files are position sorted, so bedtools can sweep them together rather
+    # than building an interval tree over every enhancer
+    peak_enh_overlap = peak_bed.intersect(enh_bed, wa=True, wb=True, sorted=True)
+    # Only parse the two columns that are kept, then drop missing rows with a single
+    # boolean mask instead of running dropna over every column of the overlap
     peak_enh_overlap_df = peak_enh_overlap.to_dataframe(
         names=[
             "peak_chr", "peak_start", "peak_end", "peak_id",
             "enh_chr", "enh_start", "enh_end", "enh_id",
             "enh_score"  # only if you had a score column in your enhancers
-        ]
-    ).dropna()
-    peak_enh_overlap_subset_df = peak_enh_overlap_df[["peak_id", "enh_score"]]
+        ],
+        usecols=["peak_id", "enh_score"]
+    )
+    enh_scores = peak_enh_overlap_df["enh_score"].to_numpy(dtype=np.float64)
+    has_score = ~np.isnan(enh_scores) & peak_enh_overlap_df["peak_id"].notna().to_numpy()
+    peak_enh_overlap_subset_df = peak_enh_overlap_df[has_score]
         
     return peak_enh_overlap_subset_df
 
@@ -112,10 +131,10 @@ def main():
         logging.info("Enhancer BED file exists, loading...")
     
     peak_df = pd.read_parquet(os.path.join(OUTPUT_DIR, "tmp/peak_df.parquet"), engine="pyarrow")
-    peak_bed = pybedtools.BedTool.from_dataframe(peak_df)
+    peak_bed = pybedtools.BedTool.from_dataframe(peak_df).sort()
 
-    # Load in the peak and enhancer bed files
-    enh_bed = pybedtools.BedTool(f"{TMP_DIR}/enhancer.bed")
+    # Load in the peak and enhancer bed files, sorted by position for the intersect
+    enh_bed = pybedtools.BedTool(f"{TMP_DIR}/enhancer.bed").sort()
 
     # Find the peaks that are in known enhancer regions
     peak_enh_df = find_peaks_in_known_enhancer_region(peak_bed, enh_bed)
@@ -207,26 +207,26 @@ def create_tf_peak_gene_mapping_dicts(tfs, peaks, genes):
     return tf_i, peak_i, gene_i
 
 def cast_homer_tf_to_peak_df_sparse(homer_results, tf_i, peak_i):
-    homer_results = homer_results[["source_id","peak_id","homer_binding_score"]].copy()
-    homer_results["source_id"] = homer_results["source_id"].astype(str).str.capitalize().map(tf_i)
-    homer_results["peak_id"]   = homer_results["peak_id"].astype(str).map(peak_i)
-    homer_results = homer_results.dropna(subset=["source_id","peak_id"])
+    # The mapping dicts are built in enumeration order, so their keys are already in
+    # position order and a vectorized Index lookup replaces the per-row dict .map()
+    tf_rows   = pd.Index(list(tf_i)).get_indexer(homer_results["source_id"].astype(str).str.capitalize())
+    peak_cols = pd.Index(list(peak_i)).get_indexer(homer_results["peak_id"].astype(str))
+    keep = (tf_rows >= 0) & (peak_cols >= 0)
     homer_tf_peak_sparse = sparse.coo_matrix(
-        (homer_results["homer_binding_score"].astype(np.float32).values,
-        (homer_results["source_id"].astype(int).values, homer_results["peak_id"].astype(int).values)),
+        (homer_results["homer_binding_score"].to_numpy(dtype=np.float32)[keep],
+        (tf_rows[keep], peak_cols[keep])),
         shape=(len(tf_i), len(peak_i))
     ).tocsr()
 
     return homer_tf_peak_sparse
 
 def cast_peak_to_tg_distance_sparse(genes_near_peaks, peak_i, gene_i):
-    genes_near_peaks = genes_near_peaks[["peak_id","target_id","TSS_dist_score"]].copy()
-    genes_near_peaks["peak_id"]   = genes_near_peaks["peak_id"].astype(str).map(peak_i)
-    genes_near_peaks["target_id"] = genes_near_peaks["target_id"].astype(str).map(gene_i)
-    genes_near_peaks = genes_near_peaks.dropna(subset=["peak_id","target_id"])
+    peak_rows = pd.Index(list(peak_i)).get_indexer(genes_near_peaks["peak_id"].astype(str))
+    gene_cols = pd.Index(list(gene_i)).get_indexer(genes_near_peaks["target_id"].astype(str))
+    keep = (peak_rows >= 0) & (gene_cols >= 0)
     gene_distance_sparse = sparse.coo_matrix(
-        (genes_near_peaks["TSS_dist_score"].astype(np.float32).values,
-        (genes_near_peaks["peak_id"].astype(int).values, genes_near_peaks["target_id"].astype(int).values)),
+        (genes_near_peaks["TSS_dist_score"].to_numpy(dtype=np.float32)[keep],
+        (peak_rows[keep], gene_cols[keep])),
         shape=(len(peak_i), len(gene_i))
     ).tocsr()
     
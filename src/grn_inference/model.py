@@ -49,25 +49,27 @@ def undersample_training_set(X_dd, y_dd, seed=42):
     y_dd = y_dd.rename("label")
     df = X_dd.assign(label=y_dd)
 
-    # Split into positive and negative
-    pos_df = df[df.label == 1]
-    neg_df = df[df.label == 0]
-    
-    # Compute number of positives
-    n_pos = pos_df.shape[0].compute()
-    n_neg = neg_df.shape[0].compute()
+    # Count both classes in a single pass over the labels
+    label_counts = y_dd.value_counts().compute()
+    n_pos = int(label_counts.get(1, 0))
+    n_neg = int(label_counts.get(0, 0))
     frac = n_pos / n_neg
     
     logging.info(f'\tPositive values: {n_pos}')
     logging.info(f'\tNegative values: {n_neg}')
     
-    # Randomly sample negatives
-    neg_df_sampled = neg_df.sample(frac=frac, random_state=seed)
-    
     logging.info(f"\tUnderscaling so positive and negative classes both have {n_pos} values")
 
-    # Combine
-    balanced_df = dd.concat([pos_df, neg_df_sampled])
+    # Keep every positive and a random `frac` of the negatives with one row mask per
+    # partition, rather than splitting, sampling, and concatenating separate DataFrames
+    def keep_balanced_rows(part, partition_info=None):
+        partition_number = partition_info["number"] if partition_info else 0
+        rng = np.random.default_rng([seed, partition_number])
+        is_pos = part["label"].to_numpy() == 1
+        keep_neg = rng.random(len(part)) < frac
+        return part[is_pos | keep_neg]
+
+    balanced_df = df.map_partitions(keep_balanced_rows, meta=df._meta)
     balanced_df = balanced_df.shuffle(on="label", seed=seed)
 
     # Separate X and y again
@@ -118,9 +120,11 @@ def train_xgboost_dask(train_test_dir, feature_names, client=None):
         
     X_train_dd_bal, y_train_dd_bal = undersample_training_set(X_train_dd, y_train_dd)
 
-    dtrain = xgb.dask.DaskDMatrix(
+    # With tree_method="hist" the training data can be quantized straight into histogram
+    # bins, which avoids keeping a full float copy of the feature matrix on the workers
+    dtrain = xgb.dask.DaskQuantileDMatrix(
         client=client,
-        data=X_train_dd_bal,
+        data=X_train_dd_bal.astype("float32"),
         label=y_train_dd_bal,
         feature_names=feature_names
     )
@@ -223,6 +227,13 @@ def parameter_grid_search(
     # total = len(grid_list)
     # logging.info(f"Parameter grid has {total} combinations")
 
+    # Convert the train / validation sets to contiguous float32 arrays once so that each
+    # of the parallel fits reuses them instead of re-converting the DataFrames
+    X_tr_arr = np.ascontiguousarray(X_tr.to_numpy(dtype=np.float32))
+    y_tr_arr = y_tr.to_numpy(dtype=np.int8)
+    X_val_arr = np.ascontiguousarray(X_val.to_numpy(dtype=np.float32))
+    y_val_arr = y_val.to_numpy(dtype=np.int8)
+
     def eval_params(params: dict) -> dict:
         model = xgb.XGBClassifier(
             **params,
@@ -231,14 +242,14 @@ def parameter_grid_search(
             eval_metric='logloss'
         )
         model.fit(
-            X_tr,
-            y_tr,
-            eval_set=[(X_val, y_val)],
+            X_tr_arr,
+            y_tr_arr,
+            eval_set=[(X_val_arr, y_val_arr)],
             verbose=False
         )
-        y_pred = model.predict_proba(X_val)[:, 1]
-        val_ap = average_precision_score(y_val, y_pred)
-        val_auc = roc_auc_score(y_val, y_pred)
+        y_pred = model.predict_proba(X_val_arr)[:, 1]
+        val_ap = average_precision_score(y_val_arr, y_pred)
+        val_auc = roc_auc_score(y_val_arr, y_pred)
 
         imp = model.feature_importances_
         p = imp / np.sum(imp + 1e-12)
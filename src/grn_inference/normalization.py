@@ -1,10 +1,22 @@
 import numpy as np
 import pandas as pd
+import dask
 import dask.dataframe as dd
 import logging
 from typing import Union
 from dask.dataframe.utils import is_dataframe_like
 
+def _minmax_scale_array(values: np.ndarray, col_mins: np.ndarray, col_maxs: np.ndarray) -> np.ndarray:
+    """
+    Rescales each column of a 2D float array in place to [0, 1] using the given column
+    minimums and maximums. Columns where max == min are set to 0.0.
+    """
+    ranges = col_maxs - col_mins
+    values -= col_mins
+    np.divide(values, ranges, out=values, where=ranges != 0)
+    values[:, ranges == 0] = 0.0
+    return values
+
 def minmax_normalize_dask(
     ddf: dd.DataFrame,
     score_cols: list[str],
@@ -16,29 +28,52 @@ def minmax_normalize_dask(
     """
     ddf = ddf.persist()
 
+    stats_ddf = ddf[score_cols]
     if sample_frac:
-        stats_df = ddf[score_cols].sample(frac=sample_frac, random_state=random_state).compute()
-    else:
-        stats_df = ddf[score_cols].compute()
+        stats_ddf = stats_ddf.sample(frac=sample_frac, random_state=random_state)
 
-    col_mins = stats_df.min().to_dict()
-    col_maxs = stats_df.max().to_dict()
+    # Reduce the min and max together in a single pass over the partitions
+    # rather than materializing the score columns on the client
+    col_mins, col_maxs = dask.compute(stats_ddf.min(), stats_ddf.max())
+    col_mins = col_mins[score_cols].to_numpy(dtype=np.float64)
+    col_maxs = col_maxs[score_cols].to_numpy(dtype=np.float64)
 
     def normalize_partition(df):
         if not is_dataframe_like(df):
             raise TypeError(f"Expected DataFrame, got {type(df)}")
 
         df = df.copy()
-        for col in score_cols:
-            min_val = col_mins[col]
-            max_val = col_maxs[col]
-            if max_val != min_val:
-                df[col] = (df[col] - min_val) / (max_val - min_val)
-            else:
-                df[col] = 0.0
+        values = df[score_cols].to_numpy(dtype=np.float64, copy=True)
+        df[score_cols] = _minmax_scale_array(values, col_mins, col_maxs)
         return df
 
-    return ddf.map_partitions(normalize_partition, meta=ddf._meta.copy())
+    meta = ddf._meta.copy()
+    meta[score_cols] = meta[score_cols].astype(np.float64)
+
+    return ddf.map_partitions(normalize_partition, meta=meta)
+
+def _clip_normalize_log1p_array(
+    values: np.ndarray,
+    lows: np.ndarray,
+    highs: np.ndarray,
+    apply_log1p: bool = True
+) -> np.ndarray:
+    """
+    Clips each column of a 2D float array to [low, high], rescales it to [0, 1], and
+    optionally log1p-transforms it. All steps run in place on the array.
+
+    Columns where high == low are set to 0.0.
+    """
+    np.clip(values, lows, highs, out=values)
+    ranges = highs - lows
+    values -= lows
+    np.divide(values, ranges, out=values, where=ranges != 0)
+    values[:, ranges == 0] = 0.0
+
+    if apply_log1p:
+        np.log1p(values, out=values)
+
+    return values
 
 def clip_and_normalize_log1p_pandas(
     df: pd.DataFrame,
@@ -80,26 +115,18 @@ def clip_and_normalize_log1p_pandas(
         sample = df[score_cols]
 
     q_lo, q_hi = quantiles
-    quantile_lows = sample.quantile(q_lo)
-    quantile_highs = sample.quantile(q_hi)
-
-    for col in score_cols:
-        low, high = quantile_lows[col], quantile_highs[col]
-        df[col] = df[col].clip(lower=low, upper=high)
-
-        if high != low:
-            df[col] = (df[col] - low) / (high - low)
-        else:
-            df[col] = 0.0
+    lows = sample.quantile(q_lo).to_numpy(dtype=np.float64)
+    highs = sample.quantile(q_hi).to_numpy(dtype=np.float64)
 
-        if apply_log1p:
-            df[col] = np.log1p(df[col])
+    values = df[score_cols].to_numpy(dtype=np.float64, copy=True)
+    df[score_cols] = _clip_normalize_log1p_array(values, lows, highs, apply_log1p)
 
     return df
 
 def minmax_normalize_pandas(
     df: pd.DataFrame,
     score_cols: list[str],
+    bounds: Union[None, dict[str, tuple[float, float]]] = None,
 ) -> pd.DataFrame:
     """
     Applies global min-max normalization to selected columns in a Pandas DataFrame.
@@ -110,6 +137,10 @@ def minmax_normalize_pandas(
         The Pandas DataFrame containing the columns to normalize.
     score_cols : list of str
         List of column names to normalize.
+    bounds : dict of str to (float, float) or None
+        Known ``(min, max)`` for columns whose range is fixed by an earlier transform
+        (e.g. ``(0, np.log(2))`` after ``clip_and_normalize_log1p_pandas``). These
+        columns are rescaled directly without scanning for their min and max.
 
     Returns
     -------
@@ -120,12 +151,26 @@ def minmax_normalize_pandas(
     
     if isinstance(df, dd.DataFrame):
         df = df.compute()
-        
-    for col in score_cols:
-        min_val = df[col].min()
-        max_val = df[col].max()
-        if max_val != min_val:
-            df.loc[:, col] = (df[col] - min_val) / (max_val - min_val)
-        else:
-            df.loc[:, col] = 0.0
+    
+    if len(df) == 0:
+        return df
+    
+    bounds = bounds or {}
+    
+    # Normalize all of the score columns at once as a single 2D block
+    values = df[score_cols].to_numpy(dtype=np.float64, copy=True)
+    col_mins = np.empty(len(score_cols), dtype=np.float64)
+    col_maxs = np.empty(len(score_cols), dtype=np.float64)
+    
+    # Only scan the columns without a known range
+    scan_idx = [i for i, col in enumerate(score_cols) if col not in bounds]
+    if scan_idx:
+        col_mins[scan_idx] = np.nanmin(values[:, scan_idx], axis=0)
+        col_maxs[scan_idx] = np.nanmax(values[:, scan_idx], axis=0)
+    
+    for i, col in enumerate(score_cols):
+        if col in bounds:
+            col_mins[i], col_maxs[i] = bounds[col]
+    
+    df[score_cols] = _minmax_scale_array(values, col_mins, col_maxs)
     return df
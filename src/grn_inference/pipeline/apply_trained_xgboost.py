@@ -1,7 +1,9 @@
 import dask.dataframe as dd
-from dask.distributed import Client
+import pyarrow.parquet as pq
+import pyarrow.compute as pc
 import xgboost as xgb
 import pandas as pd
+import numpy as np
 import os
 import logging
 import argparse
@@ -11,7 +13,7 @@ def parse_args() -> argparse.Namespace:
     parser.add_argument("--output_dir", type=str, required=True, help="Directory to save predictions")
     parser.add_argument("--model", type=str, required=True, help="Path to trained XGBoost .json Booster model")
     parser.add_argument("--target", type=str, required=True, help="Path to .parquet file for inference")
-    parser.add_argument("--save_name", type=str, required=True, help="Filename for output")
+    parser.add_argument("--save_name", type=str, required=True, help="Filename for output. Names ending in .parquet are written as Parquet, anything else as a TSV")
     return parser.parse_args()
 
 def read_inferred_network(inferred_network_file: str) -> dd.DataFrame:
@@ -20,16 +22,30 @@ def read_inferred_network(inferred_network_file: str) -> dd.DataFrame:
     where each row is (source_id, target_id) and columns are score_types (mean-aggregated).
     """
     logging.info(f"Loading melted sparse network from: {inferred_network_file}")
-    melted_ddf = dd.read_parquet(inferred_network_file, engine="pyarrow")
-
-    # Standardize IDs
-    melted_ddf["source_id"] = melted_ddf["source_id"].str.upper()
-    melted_ddf["target_id"] = melted_ddf["target_id"].str.upper()
+    # The network is pivoted in memory below, so read it straight into an Arrow table
+    # rather than building a Dask graph that is immediately collapsed to one partition
+    melted_table = pq.read_table(
+        inferred_network_file,
+        columns=["source_id", "peak_id", "target_id", "score_type", "score_value"]
+    )
+    
+    # Standardize IDs with Arrow's vectorized utf8_upper kernel before converting to pandas
+    for col in ["source_id", "target_id"]:
+        melted_table = melted_table.set_column(
+            melted_table.schema.get_field_index(col),
+            col,
+            pc.utf8_upper(melted_table[col])
+        )
+    melted_df = melted_table.to_pandas()
+    
+    # Feature scores only need single precision, downcasting at load halves the memory
+    # used by the groupby, pivot, and model input
+    melted_df["score_value"] = melted_df["score_value"].astype("float32")
 
     # Aggregate scores
-    grouped_ddf = (
-        melted_ddf
-        .groupby(["source_id", "peak_id", "target_id", "score_type"])["score_value"]
+    grouped_df = (
+        melted_df
+        .groupby(["source_id", "peak_id", "target_id", "score_type"], observed=True)["score_value"]
         .mean()
         .reset_index()
     )
@@ -44,8 +60,7 @@ def read_inferred_network(inferred_network_file: str) -> dd.DataFrame:
         ).reset_index()
 
     # Apply pivot in a single partition (best if you've already aggregated)
-    pivot_df = grouped_ddf.compute()  # convert to Pandas here
-    pivot_df = pivot_partition(pivot_df)
+    pivot_df = pivot_partition(grouped_df)
     return dd.from_pandas(pivot_df, npartitions=1)
 
 def main():
@@ -61,23 +76,22 @@ def main():
     booster.load_model(model_path)
 
     logging.info("Reading inferred network")
-    inferred_dd = read_inferred_network(target_path)
+    inferred_df = read_inferred_network(target_path).compute()
     
     feature_names = booster.feature_names
     
-    X_dd = inferred_dd[feature_names]
-
-    logging.info("Converting to DaskDMatrix")
-    client = Client()
-    dtest = xgb.dask.DaskDMatrix(data=X_dd, feature_names=feature_names, client=client)
+    # Hand XGBoost a C-contiguous float32 array so it can predict without another conversion
+    X = np.ascontiguousarray(inferred_df[feature_names].to_numpy(dtype=np.float32))
 
-    logging.info("Running distributed prediction")
-    y_pred = xgb.dask.predict(client=client, model=booster, data=dtest)
+    # The pivoted network is already a single in-memory partition, so predict in-process
+    # with XGBoost's multithreaded inplace_predict rather than shipping it to a Dask cluster
+    logging.info("Running multithreaded prediction")
+    booster.set_param({"nthread": os.cpu_count()})
+    y_pred = booster.inplace_predict(X)
 
-    # Convert to pandas (merging Dask DataFrame + Dask array)
     logging.info("Joining predictions back to source-target pairs")
-    result_df = inferred_dd[["source_id", "peak_id", "target_id"]].compute()
-    result_df["score"] = y_pred.compute()
+    result_df = inferred_df[["source_id", "peak_id", "target_id"]].copy()
+    result_df["score"] = y_pred
     result_df = result_df.drop_duplicates()
     
     if not os.path.exists(output_dir):
@@ -85,7 +99,11 @@ def main():
 
     output_path = os.path.join(output_dir, save_name)
     logging.info(f"Saving to {output_path}")
-    result_df.to_csv(output_path, sep="\t", index=False)
+    if output_path.lower().endswith(".parquet"):
+        result_df.to_parquet(output_path, engine="pyarrow", compression="zstd", index=False)
+    else:
+        # TSV output is kept for downstream tools that expect a delimited text file
+        result_df.to_csv(output_path, sep="\t", index=False)
     logging.info("Done!")
 
 if __name__ == "__main__":
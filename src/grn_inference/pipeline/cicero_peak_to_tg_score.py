@@ -37,15 +37,39 @@ def main():
     cicero_peak_to_peak_file = os.path.join(output_dir, "cicero_peak_to_peak.csv")
     cicero_peak_to_gene_file = os.path.join(output_dir, "cicero_peak_to_gene.csv")
 
+    # Use Arrow's multithreaded CSV reader, the peak-to-peak connections can be very large.
+    # The co-accessibility scores only need single precision
     logging.info("Loading 'cicero_peak_to_peak.csv'")
-    peak_to_peak: pd.DataFrame = pd.read_csv(cicero_peak_to_peak_file, header=0, index_col=None)
+    peak_to_peak: pd.DataFrame = pd.read_csv(
+        cicero_peak_to_peak_file, 
+        header=0, 
+        index_col=None, 
+        engine="pyarrow",
+        dtype={"coaccess": "float32"}
+    )
     
     logging.info("Loading 'cicero_peak_to_gene.csv'")
-    peak_to_gene: pd.DataFrame = pd.read_csv(cicero_peak_to_gene_file, header=0, index_col=0)
+    peak_to_gene: pd.DataFrame = pd.read_csv(cicero_peak_to_gene_file, header=0, index_col=0, engine="pyarrow")
+
+    # Factorize the peak names once so that both merges join on integer codes rather
+    # than hashing the peak strings of every row. Names are restored after the merges
+    n_conns = len(peak_to_peak)
+    peak_codes, peak_names = pd.factorize(
+        pd.concat([
+            peak_to_peak["Peak1"], 
+            peak_to_peak["Peak2"], 
+            peak_to_gene.index.to_series(), 
+            peak_to_gene["site_name"]
+        ], ignore_index=True)
+    )
+    peak_to_peak["Peak1"] = peak_codes[:n_conns]
+    peak_to_peak["Peak2"] = peak_codes[n_conns:2 * n_conns]
+    peak_to_gene_index_codes = peak_codes[2 * n_conns:2 * n_conns + len(peak_to_gene)]
+    peak_to_gene["site_name"] = peak_codes[2 * n_conns + len(peak_to_gene):]
 
     # Merge matching peaks to get a single dataframes
     logging.info("Merging peak to peak with peak to gene scores")
-    merged_peaks = pd.merge(peak_to_peak, peak_to_gene, how="outer", left_on=["Peak1", "Peak2"], right_on=[peak_to_gene.index, "site_name"])
+    merged_peaks = pd.merge(peak_to_peak, peak_to_gene, how="outer", left_on=["Peak1", "Peak2"], right_on=[peak_to_gene_index_codes, "site_name"])
     merged_peaks = merged_peaks.rename(columns={"coaccess": "score"})
 
     # Remove edges between peaks with no coaccessibility
@@ -60,9 +84,15 @@ def main():
     logging.info("Setting scores to 1 for peaks in the target gene promoter region, otherwise keeping the peak-to-peak score")
     merged_peaks.loc[merged_peaks["score"].isna() & merged_peaks["gene"].notna(), ['score']] = 1
 
-    # Add target genes for the peak-to-peak scores if Peak1 is in promoter_peaks
+    # Add target genes for the peak-to-peak scores if Peak1 is in promoter_peaks. Only the
+    # peak, score, and gene columns are used after this, so leave the rest out of the merge
     logging.info("Adding target genes to the peak-to-peak scores")
-    merged_with_promoter_genes = pd.merge(left=merged_peaks, right=promoter_peaks, on="Peak1", how="right")
+    merged_with_promoter_genes = pd.merge(
+        left=merged_peaks[["Peak1", "Peak2", "score", "gene"]], 
+        right=promoter_peaks, 
+        on="Peak1", 
+        how="right"
+    )
 
     # Combine the gene associations for each row, removing any peaks not associated with a gene
     logging.info("Combining gene associations and removing peaks not associated with a gene")
@@ -77,6 +107,10 @@ def main():
     merged_with_promoter_genes = merged_with_promoter_genes.rename(columns={"Peak2": "peak_id", "gene": "target_id", "score": "cicero_score"})
     merged_with_promoter_genes = merged_with_promoter_genes[["peak_id","target_id","cicero_score"]]
     
+    # Map the peak codes back to their names
+    final_codes = merged_with_promoter_genes["peak_id"].to_numpy()
+    merged_with_promoter_genes["peak_id"] = peak_names.take(final_codes.astype(np.int64)).to_numpy(dtype=object)
+    
     # Format the peaks to chr:start-stop rather than chr_start_stop to match the ATACseq peaks
     merged_with_promoter_genes["peak_id"] = (
         merged_with_promoter_genes["peak_id"]
@@ -88,20 +122,21 @@ def main():
         score_cols=["cicero_score"], 
     )
     
+    # Work on the raw score array in place rather than through repeated .loc indexing
+    cicero_scores = normalized_df["cicero_score"].to_numpy(dtype=np.float64, copy=True)
+    
     # 1) Compute mean of the “non-1” scores
-    non1_mask = normalized_df["cicero_score"] < 1.0
-    non1_mean = normalized_df.loc[non1_mask, "cicero_score"].mean()
-
+    non1_mask = cicero_scores < 1.0
+    
     # 2) Shift only those rows so their mean becomes 0.5
     #    NewScore = oldScore − non1_mean + 0.5
-    normalized_df.loc[non1_mask, "cicero_score"] = (
-        normalized_df.loc[non1_mask, "cicero_score"]
-        - non1_mean
-        + 0.5
-    )
+    if non1_mask.any():
+        non1_mean = cicero_scores[non1_mask].mean()
+        cicero_scores[non1_mask] += 0.5 - non1_mean
 
     # 3) Clip to [0,1] in case any values wandered outside
-    normalized_df["cicero_score"] = normalized_df["cicero_score"].clip(0.0, 1.0)
+    np.clip(cicero_scores, 0.0, 1.0, out=cicero_scores)
+    normalized_df["cicero_score"] = cicero_scores
     
     plot_feature_score_histogram(normalized_df, "cicero_score", output_dir)
 
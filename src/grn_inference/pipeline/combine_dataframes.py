@@ -10,11 +10,11 @@ import pandas as pd
 import logging
 from typing import Set, Tuple, Union
 from tqdm import tqdm
+from joblib import Parallel, delayed
 
 from grn_inference.normalization import (
     minmax_normalize_pandas,
-    minmax_normalize_dask,
-    clip_and_normalize_log1p_dask
+    clip_and_normalize_log1p_pandas
 )
 
 def parse_args() -> argparse.Namespace:
@@ -60,17 +60,27 @@ def parse_args() -> argparse.Namespace:
     args: argparse.Namespace = parser.parse_args()
     return args
 
-def plot_column_histograms(df, fig_dir, df_name="inferred_net"):
+def _bin_column(values: np.ndarray, bins: int = 50) -> Tuple[np.ndarray, np.ndarray]:
+    """Histogram the finite values of a single column."""
+    return np.histogram(values[np.isfinite(values)], bins=bins)
+
+def plot_column_histograms(df, fig_dir, df_name="inferred_net", n_jobs=-1):
     # Create a figure and axes with a suitable size
     plt.figure(figsize=(15, 8))
     
     # Select only the numerical columns (those with numeric dtype)
     cols = df.select_dtypes(include=[np.number]).columns
+    
+    # Bin every column in parallel with NumPy (which releases the GIL), then only
+    # draw the precomputed counts on the main thread
+    histograms = Parallel(n_jobs=n_jobs, prefer="threads")(
+        delayed(_bin_column)(df[col].to_numpy(dtype=np.float32)) for col in cols
+    )
 
     # Loop through each feature and create a subplot
-    for i, col in enumerate(cols, 1):
+    for i, (col, (counts, edges)) in enumerate(zip(cols, histograms), 1):
         plt.subplot(3, 4, i)  # 3 rows, 4 columns, index = i
-        plt.hist(df[col], bins=50, alpha=0.7, edgecolor='black')
+        plt.bar(edges[:-1], counts, width=np.diff(edges), align="edge", alpha=0.7, edgecolor='black')
         plt.title(f"{col} distribution")
         plt.xlabel(col)
         plt.ylabel("Frequency")
@@ -99,10 +109,30 @@ def build_full_edges(tf_peak_edges: Set[Tuple[str, str]], peak_tg_edges: Set[Tup
                 full_edges.add((source_id, peak_id, target_id))
     return full_edges
 
+def row_means(df: Union[pd.DataFrame, dd.DataFrame]) -> np.ndarray:
+    """Mean of the numeric columns of each row, computed as a single BLAS matrix-vector product.
+
+    NaNs are skipped like DataFrame.mean(axis=1): they are zeroed for the product and each
+    row sum is divided by its number of non-NaN values (all-NaN rows stay NaN).
+    """
+    vals = df.select_dtypes("number").to_numpy(dtype=np.float32)
+    ones = np.ones(vals.shape[1], dtype=np.float32)
+    
+    nan_mask = np.isnan(vals)
+    if not nan_mask.any():
+        return (vals @ ones) * np.float32(1.0 / vals.shape[1])
+    
+    counts = (vals.shape[1] - nan_mask.sum(axis=1)).astype(np.float32)
+    row_sums = np.where(nan_mask, np.float32(0), vals) @ ones
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return row_sums / counts
+
 def compute_expression_means(rna_df: dd.DataFrame) -> Tuple[dd.DataFrame, dd.DataFrame]:
     """Compute mean TF and TG expression from RNA matrix."""
-    mean_expr = rna_df.select_dtypes("number").mean(axis=1)
-    rna_df["mean_expression"] = mean_expr
+    if isinstance(rna_df, dd.DataFrame):
+        rna_df = rna_df.compute()
+    
+    rna_df["mean_expression"] = row_means(rna_df)
     
     norm_rna_df = minmax_normalize_pandas(
         df=rna_df, 
@@ -116,7 +146,10 @@ def compute_expression_means(rna_df: dd.DataFrame) -> Tuple[dd.DataFrame, dd.Dat
 
 def compute_atac_mean(atac_df: dd.DataFrame) -> dd.DataFrame:
     """Compute mean peak accessibility."""
-    atac_df["mean_peak_accessibility"] = atac_df.select_dtypes("number").mean(axis=1)
+    if isinstance(atac_df, dd.DataFrame):
+        atac_df = atac_df.compute()
+    
+    atac_df["mean_peak_accessibility"] = row_means(atac_df)
     
     norm_atac_df = minmax_normalize_pandas(
         df=atac_df, 
@@ -125,6 +158,12 @@ def compute_atac_mean(atac_df: dd.DataFrame) -> dd.DataFrame:
     
     return norm_atac_df[["peak_id", "mean_peak_accessibility"]]
 
+def _key_series(df: Union[pd.DataFrame, dd.DataFrame], key_col: str, score_col: str) -> pd.Series:
+    """Return `score_col` as a float Series indexed by `key_col`."""
+    if isinstance(df, dd.DataFrame):
+        df = df.compute()
+    return df.set_index(key_col)[score_col].astype(np.float64)
+
 def build_scored_edges_dataframe(
     full_edges: Set[Tuple[str, str, str]],
     sliding_window_dd: dd.DataFrame,
@@ -155,43 +194,106 @@ def build_scored_edges_dataframe(
     df = df.merge(cicero_dd, on=["peak_id", "target_id"], how="left")
     logging.info("      Done!")
 
-    logging.info("  - (5/7) Adding mean TF expression scores")
-    df = df.merge(rna_tf_dd, on="source_id", how="left")
+    # The expression and accessibility tables are keyed on a single column, so index each one
+    # once and fill all three columns in a single pass over the partitions instead of three merges
+    logging.info("  - (5-7/7) Adding mean TF expression, mean TG expression, and mean peak accessibility")
+    single_key_lookups = []
+    for key_col, score_df, score_col in [
+        ("source_id", rna_tf_dd, "mean_TF_expression"),
+        ("target_id", rna_tg_dd, "mean_TG_expression"),
+        ("peak_id",   atac_dd,   "mean_peak_accessibility"),
+    ]:
+        score_series = _key_series(score_df, key_col, score_col)
+        
+        # A repeated key matches several rows in a left merge, which a positional lookup
+        # cannot reproduce, so those tables keep the merge
+        if score_series.index.has_duplicates:
+            logging.info(f"      Duplicate {key_col} values in the {score_col} table, merging instead")
+            df = df.merge(score_series.reset_index(), on=key_col, how="left")
+        else:
+            single_key_lookups.append((key_col, score_series))
+
+    def add_single_key_scores(part):
+        part = part.copy()
+        for key_col, score_series in single_key_lookups:
+            # Keys missing from the lookup table (or an empty table) are NaN, as in a left merge
+            positions = score_series.index.get_indexer(part[key_col])
+            values = np.full(len(part), np.nan, dtype=np.float64)
+            found = positions >= 0
+            values[found] = score_series.to_numpy()[positions[found]]
+            part[score_series.name] = values
+        return part
+
+    if single_key_lookups:
+        meta = df._meta.assign(**{
+            score_series.name: score_series.to_numpy()[:0] for _, score_series in single_key_lookups
+        })
+        df = df.map_partitions(add_single_key_scores, meta=meta)
     logging.info("      Done!")
 
-    logging.info("  - (6/7) Adding mean TG expression")
-    df = df.merge(rna_tg_dd, on="target_id", how="left")
-    logging.info("      Done!")
+    logging.info("\n  All merges complete. Returning final Dask DataFrame.")
+    return df
 
-    logging.info("  - (7/7) Adding mean peak accessibility")
-    df = df.merge(atac_dd, on="peak_id", how="left")
-    logging.info("      Done!")
+def read_string_file(txt_path: str, sep: str) -> pd.DataFrame:
+    """
+    Reads a STRING text file, caching it as a Parquet file next to the original.
 
-    logging.info("\n  All merges complete. Returning final Dask DataFrame.")
+    The cache is reused as long as it is newer than the text file. It is written to a
+    per-process temporary file and moved into place, so concurrent jobs sharing the
+    STRING directory never read a partial cache. If the STRING directory is not
+    writable, the text file is read without caching.
+    """
+    parquet_path = f"{txt_path}.parquet"
+    if os.path.exists(parquet_path) and os.path.getmtime(parquet_path) > os.path.getmtime(txt_path):
+        return pd.read_parquet(parquet_path, engine="pyarrow")
+
+    df = pd.read_csv(txt_path, sep=sep, engine="pyarrow")
+    tmp_path = f"{parquet_path}.{os.getpid()}.tmp"
+    try:
+        df.to_parquet(tmp_path, engine="pyarrow", compression="zstd", index=False)
+        os.replace(tmp_path, parquet_path)
+    except OSError as e:
+        logging.warning(f"    Unable to cache {txt_path} as Parquet: {e}")
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
     return df
 
 def add_string_db_scores(inferred_net_dd, string_dir, full_edges):
     # Load STRING protein info and links (small)
     logging.info("  - Reading STRING protein info")
-    protein_info_df = pd.read_csv(f"{string_dir}/protein_info.txt", sep="\t")
+    protein_info_df = read_string_file(f"{string_dir}/protein_info.txt", sep="\t")
     
     logging.info("  - Reading STRING protein links detailed")
-    protein_links_df = pd.read_csv(f"{string_dir}/protein_links_detailed.txt", sep=" ")
+    protein_links_df = read_string_file(f"{string_dir}/protein_links_detailed.txt", sep=" ")
 
     logging.info("  - Mapping STRING protein IDs to preferred names")
-    id_to_name = protein_info_df.set_index("#string_protein_id")["preferred_name"].to_dict()
-    protein_links_df["protein1"] = protein_links_df["protein1"].map(id_to_name)
-    protein_links_df["protein2"] = protein_links_df["protein2"].map(id_to_name)
+    # Factorize both protein columns together so each unique STRING ID is looked up
+    # in the protein info index once, then gather the names back by integer code.
+    # A repeated STRING ID keeps its last name, as a dict built from the index would
+    name_by_id = protein_info_df.set_index("#string_protein_id")["preferred_name"]
+    name_by_id = name_by_id[~name_by_id.index.duplicated(keep="last")]
+    protein_ids = np.concatenate([
+        protein_links_df["protein1"].to_numpy(),
+        protein_links_df["protein2"].to_numpy()
+    ])
+    codes, unique_ids = pd.factorize(protein_ids)
+    unique_names = name_by_id.reindex(unique_ids).to_numpy(dtype=object)
+    
+    # Missing protein IDs have code -1, which must map to NaN rather than the last name
+    names = np.full(len(codes), np.nan, dtype=object)
+    has_id = codes >= 0
+    names[has_id] = unique_names[codes[has_id]]
+    
+    n_links = len(protein_links_df)
+    protein_links_df["protein1"] = names[:n_links]
+    protein_links_df["protein2"] = names[n_links:]
 
     # Extract all TF–TG pairs from the full TF–peak–TG edges
     tf_tg_pairs = set((tf, tg) for tf, _, tg in full_edges)
 
     logging.info(f"  - Filtering STRING links to match {len(tf_tg_pairs):,} TF–TG pairs")
-    filtered_links_df = protein_links_df[
-        protein_links_df[["protein1", "protein2"]]
-        .apply(tuple, axis=1)
-        .isin(tf_tg_pairs)
-    ]
+    link_pairs = pd.MultiIndex.from_arrays([protein_links_df["protein1"], protein_links_df["protein2"]])
+    filtered_links_df = protein_links_df[link_pairs.isin(list(tf_tg_pairs))]
 
     # Rename columns and normalize
     filtered_links_df = filtered_links_df.rename(columns={
@@ -200,29 +302,47 @@ def add_string_db_scores(inferred_net_dd, string_dir, full_edges):
         "combined_score": "string_combined_score"
     })[["protein1", "protein2", "string_experimental_score", "string_textmining_score", "string_combined_score"]]
 
-    logging.info("  - Converting to Dask and normalizing STRING scores")
-    string_dd = dd.from_pandas(filtered_links_df, npartitions=1)
+    string_score_cols = ["string_experimental_score", "string_textmining_score", "string_combined_score"]
 
-    string_dd = clip_and_normalize_log1p_dask(
-        ddf=string_dd,
-        score_cols=["string_experimental_score", "string_textmining_score", "string_combined_score"],
+    # The filtered STRING table is small, so normalize it in memory
+    logging.info("  - Normalizing STRING scores")
+    string_df = clip_and_normalize_log1p_pandas(
+        df=filtered_links_df,
+        score_cols=string_score_cols,
         quantiles=(0.05, 0.95),
         apply_log1p=True,
         sample_frac=0.1  # optional: for speed
     )
 
-    string_dd = minmax_normalize_dask(
-        ddf=string_dd,
-        score_cols=["string_experimental_score", "string_textmining_score", "string_combined_score"],
+    # The clipped and log1p-transformed scores already span exactly [0, log(2)]
+    string_df = minmax_normalize_pandas(
+        df=string_df,
+        score_cols=string_score_cols,
+        bounds={col: (0.0, np.log(2)) for col in string_score_cols},
     )
 
+    # Index the STRING scores by (TF, TG) so each inferred network partition can look up its
+    # rows by position instead of shuffling the full network through a two-column string merge
+    string_df = string_df.set_index(["protein1", "protein2"])
+    string_df = string_df[~string_df.index.duplicated(keep="first")]
+    string_pair_index = string_df.index
+    string_scores = string_df[string_score_cols].to_numpy(dtype=np.float64)
+
+    def add_string_scores_partition(df):
+        edge_pairs = pd.MultiIndex.from_arrays([df["source_id"], df["target_id"]])
+        positions = string_pair_index.get_indexer(edge_pairs)
+        found = positions >= 0
+
+        scores = np.full((len(df), len(string_score_cols)), np.nan, dtype=np.float64)
+        scores[found] = string_scores[positions[found]]
+
+        df = df.copy()
+        df[string_score_cols] = scores
+        return df
+
     logging.info("  - Merging normalized STRING scores into inferred network")
-    merged_dd = inferred_net_dd.merge(
-        string_dd,
-        left_on=["source_id", "target_id"],
-        right_on=["protein1", "protein2"],
-        how="left"
-    ).drop(columns=["protein1", "protein2"])
+    meta = inferred_net_dd._meta.assign(**{col: np.float64() for col in string_score_cols})
+    merged_dd = inferred_net_dd.map_partitions(add_string_scores_partition, meta=meta)
 
     logging.info("  Done!")
     return merged_dd
@@ -288,14 +408,25 @@ def main():
     
     # Extract edges from DFs
     logging.info("\n ============== Finding Unique TF-peak-TG Edges ==============")
+    # The four edge tables are independent, so read them in a single compute to
+    # let the parquet reads and decoding overlap on the threaded scheduler
+    logging.info("  - Reading the TF to peak and peak to TG edge columns")
+    sliding_window_edge_df, homer_edge_df, peak_corr_edge_df, cicero_edge_df = compute(
+        sliding_window_dd[["source_id", "peak_id"]],
+        homer_dd[["source_id", "peak_id"]],
+        peak_corr_dd[["peak_id", "target_id"]],
+        cicero_dd[["peak_id", "target_id"]],
+        scheduler="threads"
+    )
+    
     logging.info("  - (1/4) Extracting Sliding Window TF to peak edges")
-    sliding_window_edges = extract_edges(sliding_window_dd, ["source_id", "peak_id"])
+    sliding_window_edges = extract_edges(sliding_window_edge_df, ["source_id", "peak_id"])
     logging.info("  - (2/4) Extracting Homer TF to peak edges")
-    homer_edges           = extract_edges(homer_dd,          ["source_id", "peak_id"])
+    homer_edges           = extract_edges(homer_edge_df,          ["source_id", "peak_id"])
     logging.info("  - (3/4) Extracting Peak to TG correlation edges")
-    peak_corr_edges       = extract_edges(peak_corr_dd,      ["peak_id", "target_id"])
+    peak_corr_edges       = extract_edges(peak_corr_edge_df,      ["peak_id", "target_id"])
     logging.info("  - (4/4) Extracting Cicero Peak to TG edges")
-    cicero_edges          = extract_edges(cicero_dd,         ["peak_id", "target_id"])
+    cicero_edges          = extract_edges(cicero_edge_df,         ["peak_id", "target_id"])
 
     # Combine edges
     logging.info('\n  - Building set of unique TF-peak-TG edges')
@@ -357,7 +488,7 @@ def main():
     logging.info("      Done!")
 
     logging.info("  - Loading the changes to memory")
-    non_null_scores_ddf.persist()
+    non_null_scores_ddf = non_null_scores_ddf.persist()
     logging.info("      Done!")
 
     # build all metrics into Dask objects
@@ -127,23 +127,22 @@ def extract_atac_peaks(atac_df, tmp_dir):
     
     if not os.path.exists(f"{tmp_dir}/peak_df.parquet"):
         logging.info(f"Extracting peak information and saving as a bed file")
-        def parse_peak_str(s):
-            try:
-                chrom, coords = s.split(":")
-                start_s, end_s = coords.split("-")
-                return chrom.replace("chr", ""), int(start_s), int(end_s)
-            except Exception:
-                raise ValueError(f"Malformed peak_id '{s}'; expected 'chrN:start-end'.")
+        peak_pos = atac_df["peak_id"].astype(str).reset_index(drop=True)
 
-        # List of peak strings
-        peak_pos = atac_df["peak_id"].tolist()
-
-        # Apply parsing function to all peak strings
-        parsed = [parse_peak_str(s) for s in peak_pos]
+        # Split every peak string into chromosome, start, and end in one vectorized regex pass
+        parsed = peak_pos.str.extract(r"^([^:]+):(\d+)-(\d+)$")
+        
+        malformed = parsed[0].isna()
+        if malformed.any():
+            raise ValueError(f"Malformed peak_id '{peak_pos[malformed].iloc[0]}'; expected 'chrN:start-end'.")
 
         # Construct DataFrame
-        peak_df = pd.DataFrame(parsed, columns=["chr", "start", "end"])
-        peak_df["peak_id"] = peak_pos
+        peak_df = pd.DataFrame({
+            "chr": parsed[0].str.replace("chr", "", regex=False),
+            "start": parsed[1].astype(np.int64),
+            "end": parsed[2].astype(np.int64),
+            "peak_id": peak_pos,
+        })
         
         # Write the peak DataFrame to a file
         peak_df.to_parquet(os.path.join(tmp_dir, "peak_df.parquet"), engine="pyarrow", index=False, compression="snappy")
@@ -250,12 +249,17 @@ def calculate_tss_distance_score(
     peak_tss_subset_df: pd.DataFrame = peak_tss_distance_df[["peak_id", "target_id", "TSS_dist_score"]]
     
     # Filter out any genes not found in the RNA-seq dataset.
+    # The peak-gene pairs only cover a few thousand distinct genes, so factorize the target
+    # column and upper-case / look up each gene name once, then expand the result by code
     gene_names_upper = set(g.upper() for g in gene_names)
-    
-    mask = peak_tss_subset_df["target_id"].str.upper().isin(gene_names_upper)
+    target_codes, target_genes = pd.factorize(peak_tss_subset_df["target_id"])
+    gene_in_rna = np.asarray(target_genes.str.upper().isin(gene_names_upper))
+    mask = np.zeros(len(target_codes), dtype=bool)
+    has_target = target_codes >= 0
+    mask[has_target] = gene_in_rna[target_codes[has_target]]
     peak_tss_subset_df = peak_tss_subset_df[mask]
     logging.info(peak_tss_subset_df.head())
-    logging.info(f'\t- Number of peaks: {len(peak_tss_subset_df.drop_duplicates(subset="peak_id"))}')
+    logging.info(f'\t- Number of peaks: {peak_tss_subset_df["peak_id"].nunique()}')
     
     return peak_tss_subset_df
 
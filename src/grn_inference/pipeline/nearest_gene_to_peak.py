@@ -1,22 +1,40 @@
 import os
+import argparse
 import logging
-import pybedtools
 import pandas as pd
 
 from grn_inference.pipeline.preprocess_datasets import (
     extract_atac_peaks_near_rna_genes
 )
 
-organism = "mmusculus"
-output_dir = "/gpfs/Labs/Uzun/SCRIPTS/PROJECTS/2024.SINGLE_CELL_GRN_INFERENCE.MOELLER/output/testing"
-tmp_dir = os.path.join(output_dir, "tmp")
-tss_distance_cutoff = 1_000_000
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Find the ATAC-seq peaks near the TSS of each scRNA-seq gene")
+    parser.add_argument("--atac_data_file", type=str, required=True, help="Path to the processed scATAC-seq parquet file")
+    parser.add_argument("--rna_data_file", type=str, required=True, help="Path to the processed scRNA-seq parquet file")
+    parser.add_argument("--organism", type=str, required=False, default="mmusculus", help="Ensembl organism name, e.g. 'mmusculus' or 'hsapiens' (default: mmusculus)")
+    parser.add_argument("--tss_distance_cutoff", type=int, required=False, default=1_000_000, help="Distance (bp) from TSS to filter peaks (default: 1,000,000)")
+    parser.add_argument("--output_dir", type=str, required=True, help="Output directory for the sample")
+    return parser.parse_args()
 
-rna_df = pd.read_parquet("/gpfs/Labs/Uzun/SCRIPTS/PROJECTS/2024.SINGLE_CELL_GRN_INFERENCE.MOELLER/input/DS011_mESC/DS011_mESC_sample1/DS011_mESC_RNA_processed.parquet", engine="pyarrow")
-atac_df = pd.read_parquet("/gpfs/Labs/Uzun/SCRIPTS/PROJECTS/2024.SINGLE_CELL_GRN_INFERENCE.MOELLER/input/DS011_mESC/DS011_mESC_sample1/DS011_mESC_ATAC_processed.parquet", engine="pyarrow")
+def main():
+    args = parse_args()
 
+    output_dir = os.path.abspath(args.output_dir)
 
-peaks_near_genes_df = extract_atac_peaks_near_rna_genes(atac_df, rna_df, organism, tss_distance_cutoff, output_dir)
+    logging.info("Loading the processed scRNA-seq and scATAC-seq datasets")
+    rna_df = pd.read_parquet(args.rna_data_file, engine="pyarrow")
+    atac_df = pd.read_parquet(args.atac_data_file, engine="pyarrow")
 
-print(peaks_near_genes_df)
+    peaks_near_genes_df = extract_atac_peaks_near_rna_genes(
+        atac_df,
+        rna_df,
+        args.organism,
+        args.tss_distance_cutoff,
+        output_dir
+    )
 
+    logging.info(peaks_near_genes_df)
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    main()
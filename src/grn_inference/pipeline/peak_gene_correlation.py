@@ -1,15 +1,14 @@
 import pandas as pd
 import numpy as np
 import scipy.sparse as sp
-import scipy.stats as stats
-from dask import delayed, compute
-from dask.diagnostics import ProgressBar
+import scipy.special as special
 import psutil
+from numba import njit
 
 import os
-import sys
 import argparse
 import logging
+from concurrent.futures import ThreadPoolExecutor
 from typing import Union
 
 from grn_inference.normalization import (
@@ -51,6 +50,13 @@ def parse_args() -> argparse.Namespace:
         required=True,
         help="Number of processors to run multithreading with"
     )
+    parser.add_argument(
+        "--alpha",
+        type=float,
+        required=False,
+        default=None,
+        help="Optional p-value cutoff for the peak-to-gene correlations (default: keep all)"
+    )
     parser.add_argument(
         "--fig_dir",
         type=str,
@@ -62,39 +68,97 @@ def parse_args() -> argparse.Namespace:
 
     return args
 
+@njit(nogil=True)
+def normalize_csr_rows(indptr, data, n_cols):
+    """
+    In-place z-score of the stored values of each CSR row, using the row mean and
+    standard deviation over all n_cols columns (implicit zeros included).
+
+    The moments of each row are accumulated in float64 and the row is normalized while
+    its values are still in cache, so no per-value row index or temporary is built.
+    Rows with zero variance are set to zero.
+    """
+    for row in range(indptr.shape[0] - 1):
+        start, end = indptr[row], indptr[row + 1]
+        row_sum = 0.0
+        row_sum_sq = 0.0
+        for k in range(start, end):
+            value = float(data[k])
+            row_sum += value
+            row_sum_sq += value * value
+        mean = row_sum / n_cols
+        variance = row_sum_sq / n_cols - mean * mean
+        if variance < 0:
+            variance = 0.0
+        std = np.sqrt(variance)
+        for k in range(start, end):
+            if std == 0:
+                data[k] = 0
+            else:
+                data[k] = (data[k] - mean) / std
+
 def row_normalize_sparse(X):
     """
     Row-normalize a sparse matrix X (CSR format) so that each row
     has zero mean and unit variance. Only nonzero entries are stored.
     """
-    # Compute row means (this works even with sparse matrices)
-    means = np.array(X.mean(axis=1)).flatten()
-    
-    # Compute row means of squared values:
-    X2 = X.multiply(X)
-    means2 = np.array(X2.mean(axis=1)).flatten()
-    
-    # Standard deviation: sqrt(E[x^2] - mean^2)
-    stds = np.sqrt(np.maximum(0, means2 - means**2))
-    
-    # Convert to LIL format for efficient row-wise operations.
-    X_norm = X.tolil(copy=True)
-    for i in range(X.shape[0]):
-        if stds[i] > 0:
-            # For each nonzero in row i, subtract the row mean and divide by std.
-            # X_norm.rows[i] gives the column indices and X_norm.data[i] the values.
-            X_norm.data[i] = [(val - means[i]) / stds[i] for val in X_norm.data[i]]
-        else:
-            # If the row has zero variance, leave it as-is (or set to zero)
-            X_norm.data[i] = [0 for _ in X_norm.data[i]]
-    return X_norm.tocsr()
+    X_norm = sp.csr_matrix(X, copy=True)
+    normalize_csr_rows(X_norm.indptr, X_norm.data, X_norm.shape[1])
+    return X_norm
+
+@njit(nogil=True)
+def sparse_row_dots(x_indptr, x_indices, x_data, y_indptr, y_indices, y_data, x_rows, y_rows, min_square):
+    """
+    Dot products between pairs of rows of two CSR matrices with sorted column indices,
+    keeping only the pairs whose squared dot product is greater than min_square.
+
+    Each pair is computed by walking the two rows' nonzero columns together, so no
+    submatrices are gathered and no intermediate products are allocated. The threshold
+    is checked as each pair finishes, so only kept pairs are written out (NaN results
+    always fail the comparison). Returns the kept pair positions and their dot products.
+    """
+    kept_pos = np.empty(x_rows.shape[0], dtype=np.int64)
+    kept_dot = np.empty(x_rows.shape[0], dtype=np.float64)
+    n_kept = 0
+    for k in range(x_rows.shape[0]):
+        a, a_end = x_indptr[x_rows[k]], x_indptr[x_rows[k] + 1]
+        b, b_end = y_indptr[y_rows[k]], y_indptr[y_rows[k] + 1]
+        total = 0.0
+        while a < a_end and b < b_end:
+            col_a = x_indices[a]
+            col_b = y_indices[b]
+            if col_a == col_b:
+                total += x_data[a] * y_data[b]
+                a += 1
+                b += 1
+            elif col_a < col_b:
+                a += 1
+            else:
+                b += 1
+        if total * total > min_square:
+            kept_pos[n_kept] = k
+            kept_dot[n_kept] = total
+            n_kept += 1
+    return kept_pos[:n_kept], kept_dot[:n_kept]
+
+def critical_r_squared(alpha: float, n: int) -> float:
+    """
+    Squared Pearson correlation above which a correlation over n observations has a
+    two-sided p-value below alpha.
+
+    The two-sided p-value is p = I_{1 - r^2}((n - 2) / 2, 1 / 2), which only grows as
+    r^2 shrinks, so p < alpha exactly when r^2 > 1 - I^{-1}_alpha((n - 2) / 2, 1 / 2).
+    Inverting the incomplete beta once replaces a p-value evaluation for every pair.
+    """
+    df_degrees = n - 2
+    return 1.0 - special.betaincinv(df_degrees / 2.0, 0.5, alpha)
 
 def auto_tune_parameters(
     num_cpu: Union[int,None] = None, 
     total_memory_gb: Union[int,None] = None
     ) -> dict:
     """
-    Suggests optimal chunk_size, batch_size, and number of Dask workers based on system resources.
+    Suggests optimal chunk_size, batch_size, and number of correlation threads based on system resources.
 
     Parameters
     ----------
@@ -142,7 +206,9 @@ def auto_tune_parameters(
     # -------------------------------
     # Tuning number of workers
     # -------------------------------
-    num_workers = max(1, num_cpu - 2)
+    # The correlation kernel releases the GIL and the normalized matrices are shared by
+    # every thread, so no cores need to be held back for a scheduler
+    num_workers = max(1, num_cpu)
 
     return {
         "chunk_size": chunk_size,
@@ -155,7 +221,9 @@ def calculate_peak_to_gene_correlations(
     gene_df,
     output_dir,
     output_file=None,
-    num_cpu=4,
+    chunk_size=10_000,
+    num_workers=1,
+    alpha=None,
 ):
     """
     Calculates peak-to-gene correlations (p < alpha).
@@ -170,8 +238,12 @@ def calculate_peak_to_gene_correlations(
         Output directory for the sample
     output_file : str, optional
         Output file path to save results (only required if streaming)
-    num_cpu : int
-        Number of threads
+    chunk_size : int
+        Number of peak-gene pairs to correlate at once
+    num_workers : int
+        Number of threads used to correlate the chunks
+    alpha : float, optional
+        If set, only keep correlations with a two-sided p-value below alpha
 
     Returns
     -------
@@ -183,65 +255,85 @@ def calculate_peak_to_gene_correlations(
 
     os.makedirs(os.path.dirname(output_file), exist_ok=True)
         
-    peaks_near_genes: pd.DataFrame = pd.read_parquet(os.path.join(output_dir, "tss_distance_score.parquet"), engine="pyarrow")
+    # Only the peak and gene IDs are needed to pick the pairs to correlate
+    peaks_near_genes: pd.DataFrame = pd.read_parquet(
+        os.path.join(output_dir, "tss_distance_score.parquet"), 
+        engine="pyarrow",
+        columns=["peak_id", "target_id"]
+    )
     
-    # Map peak_id and gene_id to matrix indices
-    peak_id_to_index = {pid: i for i, pid in enumerate(atac_df.index)}
-    gene_id_to_index = {gid: j for j, gid in enumerate(gene_df.index)}
-
-    # Filter only valid entries
-    peaks_near_genes = peaks_near_genes[
-        peaks_near_genes["peak_id"].isin(peak_id_to_index) &
-        peaks_near_genes["target_id"].isin(gene_id_to_index)
-    ].copy().drop_duplicates()
-
-    # Replace IDs with matrix indices
-    peaks_near_genes["peak_i"] = peaks_near_genes["peak_id"].map(peak_id_to_index)
-    peaks_near_genes["gene_j"] = peaks_near_genes["target_id"].map(gene_id_to_index)
-
-    pairs_to_compute = list(zip(peaks_near_genes["peak_i"], peaks_near_genes["gene_j"]))
-
-    logging.info(f"\t- Number of peak-gene pairs to test: {len(pairs_to_compute):,}")
+    # Map peak_id and gene_id to matrix indices with a single hash-table lookup per
+    # column, rather than building Python dicts over every peak and gene
+    peak_i = atac_df.index.get_indexer(peaks_near_genes["peak_id"])
+    gene_j = gene_df.index.get_indexer(peaks_near_genes["target_id"])
+
+    # Filter only valid entries (IDs missing from the matrices are -1)
+    valid_pairs = (peak_i >= 0) & (gene_j >= 0)
+    peaks_near_genes = peaks_near_genes[valid_pairs].copy()
+    peaks_near_genes["peak_i"] = peak_i[valid_pairs]
+    peaks_near_genes["gene_j"] = gene_j[valid_pairs]
     
-    assert len(pairs_to_compute) == len(peaks_near_genes)
+    # Drop duplicate pairs using a single int64 key per pair rather than hashing the
+    # string ID columns, keeping the first occurrence of each pair in its original order
+    pair_keys = (
+        peaks_near_genes["peak_i"].to_numpy(dtype=np.int64) << 32
+    ) | peaks_near_genes["gene_j"].to_numpy(dtype=np.int64)
+    _, first_idx = np.unique(pair_keys, return_index=True)
+    peaks_near_genes = peaks_near_genes.iloc[np.sort(first_idx)]
 
-    # Convert to sparse
-    X = sp.csr_matrix(atac_df.select_dtypes(include=[np.number]).values.astype(float))
-    Y = sp.csr_matrix(gene_df.select_dtypes(include=[np.number]).values.astype(float))
+    logging.info(f"\t- Number of peak-gene pairs to test: {len(peaks_near_genes):,}")
+
+    # Convert to sparse from C-contiguous float32 blocks so the CSR matrices are built
+    # row by row from half the bytes of a float64 copy
+    X = sp.csr_matrix(np.ascontiguousarray(atac_df.select_dtypes(include=[np.number]).to_numpy(dtype=np.float32)))
+    Y = sp.csr_matrix(np.ascontiguousarray(gene_df.select_dtypes(include=[np.number]).to_numpy(dtype=np.float32)))
 
     n = atac_df.shape[1]
-    df_degrees = n - 2
 
-    # Row-normalize
+    # Row-normalize, folding the 1 / (n - 1) Pearson scaling into the RNA rows once so
+    # each pair's row-wise product sums directly to its correlation
     X_norm = row_normalize_sparse(X)
     Y_norm = row_normalize_sparse(Y)
+    Y_norm.data /= (n - 1)
+
+    # Correlate the pairs in chunks with a compiled kernel that intersects each pair's
+    # sparse rows directly. The kernel releases the GIL, so the chunks can run on a
+    # thread pool
+    pair_peaks = peaks_near_genes["peak_i"].to_numpy()
+    pair_genes = peaks_near_genes["gene_j"].to_numpy()
+    X_norm.sort_indices()
+    Y_norm.sort_indices()
+    
+    # The kernel drops NaN and non-significant correlations as soon as each pair is
+    # computed, so only the kept pairs are ever written out. The p-value cutoff is
+    # applied as a threshold on r^2; without one, any non-NaN r^2 passes a threshold of -1
+    min_r_squared = critical_r_squared(alpha, n) if alpha is not None else -1.0
+    
+    def correlate_chunk(start):
+        kept_pos, r_chunk = sparse_row_dots(
+            X_norm.indptr, X_norm.indices, X_norm.data,
+            Y_norm.indptr, Y_norm.indices, Y_norm.data,
+            pair_peaks[start:start + chunk_size], pair_genes[start:start + chunk_size],
+            min_r_squared
+        )
+        return start + kept_pos, r_chunk
+    
+    with ThreadPoolExecutor(max_workers=num_workers) as executor:
+        chunk_results = list(executor.map(correlate_chunk, range(0, len(pair_peaks), chunk_size)))
+    
+    if chunk_results:
+        kept_idx = np.concatenate([idx for idx, _ in chunk_results])
+        r_vals = np.concatenate([r_chunk for _, r_chunk in chunk_results])
+    else:
+        kept_idx = np.empty(0, dtype=np.int64)
+        r_vals = np.empty(0, dtype=np.float64)
 
-    def compute_correlation_for_pair(pair, X_norm, Y_norm, df_degrees, n):
-        i, j = pair
-        r_val = X_norm.getrow(i).dot(Y_norm.getrow(j).T).toarray()[0][0]
-        r_val = r_val / (n - 1)
-        if np.isnan(r_val): 
-            return None
-
-        with np.errstate(divide='ignore', invalid='ignore'):
-            t_stat = r_val * np.sqrt(df_degrees / (1 - r_val**2))
-        p_val = 2 * stats.t.sf(np.abs(t_stat), df=df_degrees)
-        return (i, j, r_val)
-
-    tasks = [
-        delayed(compute_correlation_for_pair)(pair, X_norm, Y_norm, df_degrees, n)
-        for pair in pairs_to_compute
-    ]
-
-    with ProgressBar(dt=30, out=sys.stderr):
-        results = compute(*tasks, scheduler="threads", num_workers=num_cpu)
-
-    flat_results = [r for r in results if r is not None]
-
-    df_corr = pd.DataFrame(flat_results, columns=["peak_i", "gene_j", "correlation"])
-    df_corr["peak_id"] = [atac_df.index[i] for i in df_corr["peak_i"]]
-    df_corr["gene_id"] = [gene_df.index[j] for j in df_corr["gene_j"]]
-    df_corr = df_corr[["peak_id", "gene_id", "correlation"]]
+    # Build the output once from the gathered ID and correlation arrays
+    df_corr = pd.DataFrame({
+        "peak_id": atac_df.index.take(pair_peaks[kept_idx]),
+        "gene_id": gene_df.index.take(pair_genes[kept_idx]),
+        "correlation": r_vals,
+    })
 
     df_corr.to_parquet(output_file, engine="pyarrow", compression="snappy")
     return df_corr
@@ -284,7 +376,7 @@ def main():
         atac_df = atac_df.set_index("peak_id")
         rna_df = rna_df.set_index("gene_id")
 
-        common_cells = [cell for cell in atac_df.columns if cell in rna_df.columns]
+        common_cells = atac_df.columns[atac_df.columns.isin(rna_df.columns)]
         if len(common_cells) == 0:
             raise ValueError("No shared cells between ATAC and RNA!")
         logging.info(f'\t- Found {len(common_cells):,} shared cells')
@@ -298,7 +390,9 @@ def main():
             rna_df,
             output_dir=OUTPUT_DIR,
             output_file=PARQ,
-            num_cpu=num_workers,
+            chunk_size=chunk_size,
+            num_workers=num_workers,
+            alpha=args.alpha,
         )
         if isinstance(result, str):
             peak_to_gene_corr = pd.read_parquet(result, engine="pyarrow")  # streaming mode
@@ -316,7 +410,15 @@ def main():
         quantile_threshold = 0.70
         logging.info("More than 1,000,000 correlated edges")
         logging.info(f"Computing the {quantile_threshold*100:.0f}th percentile of correlation…")
-        cutoff = peak_to_gene_corr["correlation"].quantile(quantile_threshold)
+        # Linearly interpolated quantile (same as Series.quantile) from the two order statistics
+        # around it, found with an O(N) partial partition instead of a full sort
+        corr_values = peak_to_gene_corr["correlation"].to_numpy(dtype=np.float64)
+        corr_values = corr_values[~np.isnan(corr_values)]
+        position = quantile_threshold * (corr_values.size - 1)
+        lo = int(np.floor(position))
+        hi = min(lo + 1, corr_values.size - 1)
+        corr_values = np.partition(corr_values, [lo, hi])
+        cutoff = corr_values[lo] + (corr_values[hi] - corr_values[lo]) * (position - lo)
         logging.info(f"\tCutoff = {cutoff:.4f}")
         
     else:
@@ -342,9 +444,11 @@ def main():
     logging.info(f'\t- Number of edges after clipping and normalizing: {len(normalized_df)}')
     
     logging.info(f'\nMinmax normalizing scores between 0-1')
+    # Clipping to the full range and log1p maps the correlations onto [0, log(2)]
     normalized_ddf = minmax_normalize_pandas(
         df=normalized_df, 
         score_cols=["correlation"], 
+        bounds={"correlation": (0.0, np.log(2))},
     )
     logging.info(f'\t- Number of edges: {len(normalized_df)}')
     
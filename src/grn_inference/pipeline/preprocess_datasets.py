@@ -29,40 +29,63 @@ def parse_args() -> argparse.Namespace:
     parser.add_argument("--output_dir", type=str, required=True, help="Output directory for the sample")
     return parser.parse_args()
 
-def is_normalized(df: pd.DataFrame, threshold: float = 1.5) -> bool:
+def is_normalized(values: np.ndarray, is_float: bool, threshold: float = 1.5) -> bool:
     """
     Heuristically check if the dataset appears normalized.
+    
+    `values` is the NaN-free count matrix and `is_float` whether its source columns were floats.
+    Integer matrices are raw counts. Counts are loaded as float32, so a float matrix holding only
+    whole numbers is also treated as raw counts; otherwise the mean positive value is compared
+    against `threshold`.
     """
-    values = df.iloc[:, 1:].values
-    if not np.issubdtype(values.dtype, np.floating):
+    if not is_float:
+        return False
+    positive = values[values > 0]
+    if positive.size == 0 or np.array_equal(positive, np.floor(positive)):
         return False
-    mean_val = values[values > 0].mean()
+    mean_val = positive.mean(dtype=np.float64)
     return 0 < mean_val < threshold
 
+def coerce_numeric_columns(counts_df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Convert any count columns that did not parse as numbers with pd.to_numeric (invalid values 
+    become NaN). Columns that are already numeric are left as they are, without a copy.
+    """
+    non_numeric_cols = [col for col in counts_df.columns if not pd.api.types.is_numeric_dtype(counts_df[col])]
+    if non_numeric_cols:
+        counts_df = counts_df.copy()
+        counts_df[non_numeric_cols] = counts_df[non_numeric_cols].apply(pd.to_numeric, errors="coerce")
+    return counts_df
+
 def log2_cpm_normalize(df: pd.DataFrame, id_col_name: str, label: str = "dataset") -> pd.DataFrame:
     if id_col_name not in df.columns:
         raise ValueError(f"Identifier column '{id_col_name}' not found in DataFrame.")
 
-    # Split into ID column and numeric values
+    # Split into ID column and numeric values, only coercing columns that did not parse as numbers
     id_col = df[[id_col_name]].reset_index(drop=True)
-    counts = df.drop(columns=[id_col_name]).apply(pd.to_numeric, errors="coerce").fillna(0)
-
-    # Combine and check normalization status
-    full_df = pd.concat([id_col, counts], axis=1)
-    if is_normalized(full_df):
+    counts = coerce_numeric_columns(df.drop(columns=[id_col_name]))
+    
+    # Check normalization status on the single float32 working array instead of a concatenated copy
+    values = counts.to_numpy(dtype=np.float32, copy=True)
+    values[np.isnan(values)] = 0
+    is_float = any(pd.api.types.is_float_dtype(dtype) for dtype in counts.dtypes)
+    if is_normalized(values, is_float):
         print(f" - {label} matrix appears already normalized. Skipping log2 CPM.", flush=True)
-        return full_df
+        return pd.concat([id_col, counts.fillna(0)], axis=1)
 
     print(f" - {label} matrix appears unnormalized. Applying log2 CPM normalization.", flush=True)
 
-    # Compute log2 CPM
-    library_sizes = counts.sum(axis=0)
+    # Compute log2 CPM in place on the working array
+    library_sizes = values.sum(axis=0, dtype=np.float64)
     zero_lib = library_sizes == 0
     if zero_lib.any():
         logging.warning(f"Found {zero_lib.sum()} all-zero columns—setting library size to 1e-6 to avoid division by zero.")
         library_sizes[zero_lib] = 1e-6
-    cpm = (counts.div(library_sizes, axis=1) * 1e6).add(1)
-    log2_cpm = np.log2(cpm).reset_index(drop=True)
+    np.divide(values, library_sizes, out=values, casting="same_kind")
+    values *= np.float32(1e6)
+    values += np.float32(1)
+    np.log2(values, out=values)
+    log2_cpm = pd.DataFrame(values, columns=counts.columns, copy=False)
 
     return pd.concat([id_col, log2_cpm], axis=1)
 
@@ -164,11 +187,17 @@ def calculate_tss_distance_score(
     peak_tss_subset_df: pd.DataFrame = peak_tss_overlap_df[["peak_id", "target_id", "TSS_dist_score"]]
     
     # Filter out any genes not found in the RNA-seq dataset.
+    # The peak-gene pairs only cover a few thousand distinct genes, so factorize the target
+    # column and upper-case / look up each gene name once, then expand the result by code
     gene_names_upper = set(g.upper() for g in gene_names)
-    mask = peak_tss_subset_df["target_id"].str.upper().isin(gene_names_upper)
+    target_codes, target_genes = pd.factorize(peak_tss_subset_df["target_id"])
+    gene_in_rna = np.asarray(target_genes.str.upper().isin(gene_names_upper))
+    mask = np.zeros(len(target_codes), dtype=bool)
+    has_target = target_codes >= 0
+    mask[has_target] = gene_in_rna[target_codes[has_target]]
     peak_tss_subset_df = peak_tss_subset_df[mask]
     
-    logging.info(f'\t- Number of peaks: {len(peak_tss_subset_df.drop_duplicates(subset="peak_id"))}')
+    logging.info(f'\t- Number of peaks: {peak_tss_subset_df["peak_id"].nunique()}')
     
     return peak_tss_subset_df
     
@@ -281,12 +310,13 @@ def convert_anndata_to_pandas(adata: AnnData, id_col_name: str) -> pd.DataFrame:
         pd.DataFrame: DataFrame of gene x cell expression data. Header contains cell names, column 0 
         contains gene / peak names
     """
-    adata = adata.copy()
-    
+    # The dense array is freshly allocated by toarray, so the DataFrame can wrap it
+    # without copying (the AnnData object itself is only read)
     df = pd.DataFrame(
         data=adata.X.T.toarray(),
         index=adata.var_names,    # genes
-        columns=adata.obs_names    # filtered cells
+        columns=adata.obs_names,    # filtered cells
+        copy=False
     )
     
     # Add the gene / peak names as column 0 rather than the index
@@ -314,17 +344,22 @@ def filter_rna_seq_dataset(
 
     # Separate gene IDs vs. raw count matrix
     gene_ids = rna_df[id_col_name].astype(str).tolist()
-    counts_df = rna_df.drop(columns=[id_col_name]).copy()
+    counts_df = rna_df.drop(columns=[id_col_name])
 
-    # Ensure all other columns are numeric; coerce non‐numeric to NaN→0
-    counts_df = counts_df.apply(pd.to_numeric, errors="coerce").fillna(0).astype(int)
+    # Ensure all other columns are numeric; coerce non‐numeric to NaN→0. Only columns that
+    # did not parse as numbers are converted, and the counts stay float32 rather than being
+    # copied to int64 (they are truncated to whole counts below, as the int cast did)
+    counts_df = coerce_numeric_columns(counts_df)
 
     # Extract cell IDs from the DataFrame columns
     cell_ids = counts_df.columns.astype(str).tolist()
 
     # 2) Build AnnData with shape (cells × genes)
     #    We must transpose counts so rows=cells, columns=genes
-    counts_matrix = csr_matrix(counts_df.values)           # shape: (n_genes, n_cells)
+    counts_matrix = csr_matrix(counts_df.to_numpy(dtype=np.float32))   # shape: (n_genes, n_cells)
+    counts_matrix.data[np.isnan(counts_matrix.data)] = 0
+    np.trunc(counts_matrix.data, out=counts_matrix.data)
+    counts_matrix.eliminate_zeros()
     counts_matrix = counts_matrix.T                         # now (n_cells, n_genes)
 
     adata = AnnData(X=counts_matrix)
@@ -377,9 +412,7 @@ def filter_atac_seq_dataset(
     max_peaks: int = 40000,
     ) -> pd.DataFrame:
     
-    df = atac_df.copy()
-    
-    df = df.set_index("peak_id")
+    df = atac_df.set_index("peak_id")
     counts = csr_matrix(df.values)
     counts = counts.T
     peak_names = df.index.to_list()
@@ -427,10 +460,11 @@ def main(args):
         raise FileNotFoundError(f"RNA file not found: {args.rna_data_file}")
     
     logging.info("\nLoading ATAC-seq dataset")
-    raw_atac_df: pd.DataFrame = load_atac_dataset(args.atac_data_file)
+    # The counts are log2 CPM normalized in float32, so load them as float32 directly
+    raw_atac_df: pd.DataFrame = load_atac_dataset(args.atac_data_file, value_dtype="float32")
 
     logging.info("\nLoading RNA-seq dataset")
-    raw_rna_df: pd.DataFrame = load_rna_dataset(args.rna_data_file)
+    raw_rna_df: pd.DataFrame = load_rna_dataset(args.rna_data_file, value_dtype="float32")
     
     logging.info("\nEnsuring that the cell barcodes match for the ATACseq and RNAseq datasets")
     ensure_matching_cell_barcodes(raw_atac_df, raw_rna_df)
@@ -1,6 +1,9 @@
 import pandas as pd
 import numpy as np
 import dask.dataframe as dd
+from dask import compute
+import pyarrow.parquet as pq
+import pyarrow.compute as pc
 from dask_ml.model_selection import train_test_split
 from dask.distributed import Client
 import xgboost as xgb
@@ -25,6 +28,7 @@ from grn_inference.model import (
     train_xgboost_dask,
     parameter_grid_search,
 )
+from grn_inference.utils import edges_in_ground_truth
 
 
 def parse_args() -> argparse.Namespace:
@@ -105,16 +109,30 @@ def read_inferred_network(inferred_network_file: str) -> dd.DataFrame:
     for moderate sized networks.  Adjust ``npartitions`` if necessary.
     """
     logging.info(f"Loading melted sparse network from: {inferred_network_file}")
-    melted_ddf = dd.read_parquet(inferred_network_file, engine="pyarrow")
-
-    # Standardize IDs
-    melted_ddf["source_id"] = melted_ddf["source_id"].str.upper()
-    melted_ddf["target_id"] = melted_ddf["target_id"].str.upper()
+    # The network is pivoted in memory below, so read it straight into an Arrow table
+    # rather than building a Dask graph that is immediately collapsed to one partition
+    melted_table = pq.read_table(
+        inferred_network_file,
+        columns=["source_id", "peak_id", "target_id", "score_type", "score_value"]
+    )
+    
+    # Standardize IDs with Arrow's vectorized utf8_upper kernel before converting to pandas
+    for col in ["source_id", "target_id"]:
+        melted_table = melted_table.set_column(
+            melted_table.schema.get_field_index(col),
+            col,
+            pc.utf8_upper(melted_table[col])
+        )
+    melted_df = melted_table.to_pandas()
+    
+    # Feature scores only need single precision, downcasting at load halves the memory
+    # used by the groupby, pivot, and model input
+    melted_df["score_value"] = melted_df["score_value"].astype("float32")
 
     # Aggregate scores
-    grouped_ddf = (
-        melted_ddf
-        .groupby(["source_id", "peak_id", "target_id", "score_type"])["score_value"]
+    grouped_df = (
+        melted_df
+        .groupby(["source_id", "peak_id", "target_id", "score_type"], observed=True)["score_value"]
         .mean()
         .reset_index()
     )
@@ -129,8 +147,7 @@ def read_inferred_network(inferred_network_file: str) -> dd.DataFrame:
         ).reset_index()
 
     # Apply pivot in a single partition (best if you've already aggregated)
-    pivot_df = grouped_ddf.compute()  # convert to Pandas here
-    pivot_df = pivot_partition(pivot_df)
+    pivot_df = pivot_partition(grouped_df)
     return dd.from_pandas(pivot_df, npartitions=1)
 
 def read_ground_truth(ground_truth_file):
@@ -197,22 +214,21 @@ def label_edges_with_ground_truth(inferred_network_dd, ground_truth_df):
     maintains the laziness of the original Dask dataframe.
     """
     logging.info("Creating ground truth set")
-    ground_truth_pairs = set(zip(
-        ground_truth_df["source_id"].str.upper(),
-        ground_truth_df["target_id"].str.upper()
-    ))
+    ground_truth_tfs = ground_truth_df["source_id"].str.upper()
+    ground_truth_tgs = ground_truth_df["target_id"].str.upper()
 
     logging.info("Adding labels to inferred network")
 
     def label_partition(df):
         df = df.copy()  # avoid SettingWithCopyWarning
-        tf_tg_tuples = list(zip(df["source_id"], df["target_id"]))
-        df.loc[:, "label"] = [1 if pair in ground_truth_pairs else 0 for pair in tf_tg_tuples]
+        df["label"] = edges_in_ground_truth(
+            df["source_id"], df["target_id"], ground_truth_tfs, ground_truth_tgs
+        ).astype(np.int8)
         return df
 
     inferred_network_dd = inferred_network_dd.map_partitions(
         label_partition,
-        meta=inferred_network_dd._meta.assign(label=np.int64(0))
+        meta=inferred_network_dd._meta.assign(label=np.int8(0))
     )
 
     return inferred_network_dd
@@ -268,16 +284,14 @@ def main():
     # Only keep columns needed for modeling
     logging.info(f"Keeping {len(feature_names)} feature columns + labels")
     model_dd = inferred_network_dd[feature_names + ["label"]].persist()
-    
-    inferred_network_dd.compute().to_parquet("/gpfs/Labs/Uzun/SCRIPTS/PROJECTS/2024.SINGLE_CELL_GRN_INFERENCE.MOELLER/output/DS011_mESC/DS011_mESC_sample1/labeled_inferred_grn.parquet")
-
-    logging.info(f"Splitting {model_dd.shape[0].compute():,} rows into train/test with stratification")
 
     # Dask-ML's split works directly on Dask DataFrames
     X_dd = model_dd[feature_names]
     y_dd = model_dd["label"]
     
+    # The label counts also give the total number of rows, so only one pass is needed
     label_dist = y_dd.value_counts().compute()
+    logging.info(f"Splitting {int(label_dist.sum()):,} rows into train/test with stratification")
     logging.info(f"Label distribution: {label_dist.to_dict()}")
 
     X_train_dd, X_test_dd, y_train_dd, y_test_dd = train_test_split(
@@ -290,7 +304,8 @@ def main():
     
     model_save_path = os.path.join(trained_model_dir, f"{model_save_name}.json")
 
-    logging.info(f"Done splitting: {X_train_dd.shape[0].compute():,} train / {X_test_dd.shape[0].compute():,} test rows")
+    n_train_rows, n_test_rows = compute(X_train_dd.shape[0], X_test_dd.shape[0])
+    logging.info(f"Done splitting: {n_train_rows:,} train / {n_test_rows:,} test rows")
     logging.info(f"\tSaving Train / Test splits to disk in {trained_model_dir}")
     train_test_dir = os.path.join(trained_model_dir, f"train_test_splits/{model_save_name}")
     os.makedirs(train_test_dir, exist_ok=True)
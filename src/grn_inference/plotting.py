@@ -129,11 +129,16 @@ def plot_feature_score_histograms_split_by_label(inferred_network, features, fig
         logging.info("\tConverting Dask dataframe to pandas")
         inferred_network_pd = inferred_network[features + [label_col]].compute()
     else:
-        inferred_network_pd = inferred_network[features + [label_col]].copy()
+        inferred_network_pd = inferred_network
 
-    # Separate true/false label subsets
-    true_df = inferred_network_pd[inferred_network_pd[label_col] == 1]
-    false_df = inferred_network_pd[inferred_network_pd[label_col] == 0]
+    # Pull the feature block into NumPy once and split it by label with boolean masks,
+    # rather than copying the DataFrame and building a true / false DataFrame for each label
+    feature_block = inferred_network_pd[features].to_numpy(dtype=np.float32)
+    labels = inferred_network_pd[label_col].to_numpy()
+    true_block = feature_block[labels == 1]
+    false_block = feature_block[labels == 0]
+
+    rng = np.random.default_rng(42)
 
     ncols = 4
     nrows = math.ceil(len(features) / ncols)
@@ -144,19 +149,25 @@ def plot_feature_score_histograms_split_by_label(inferred_network, features, fig
         plt.subplot(nrows, ncols, i)
         
         # Drop NaNs
-        true_vals = true_df[feature].dropna()
-        false_vals = false_df[feature].dropna()
+        true_vals = true_block[:, i - 1]
+        false_vals = false_block[:, i - 1]
+        true_vals = true_vals[~np.isnan(true_vals)]
+        false_vals = false_vals[~np.isnan(false_vals)]
 
         # Determine min count
         min_len = min(len(true_vals), len(false_vals))
 
-        # Randomly sample both to the same size
-        true_vals_sampled = true_vals.sample(n=min_len, random_state=42)
-        false_vals_sampled = false_vals.sample(n=min_len, random_state=42)
+        # Randomly sample both to the same size by drawing row positions and gathering them
+        true_vals_sampled = true_vals[rng.choice(len(true_vals), size=min_len, replace=False)]
+        false_vals_sampled = false_vals[rng.choice(len(false_vals), size=min_len, replace=False)]
 
-        # Compute common bin edges
-        combined_vals = pd.concat([true_vals_sampled, false_vals_sampled])
-        bins = np.linspace(combined_vals.min(), combined_vals.max(), 75)  # 150 equal-width bins
+        # Compute common bin edges from the min / max of both samples without concatenating them
+        if min_len > 0:
+            lo = min(true_vals_sampled.min(), false_vals_sampled.min())
+            hi = max(true_vals_sampled.max(), false_vals_sampled.max())
+        else:
+            lo, hi = np.nan, np.nan
+        bins = np.linspace(lo, hi, 75)  # 150 equal-width bins
 
         # Plot histograms using the same bin edges
         plt.hist(false_vals_sampled, bins=bins, alpha=0.6, color="#747474", label="False Scores")
@@ -423,20 +434,26 @@ def plot_stability_boxplot(X: pd.DataFrame, y: pd.Series, feature_names: list[st
 
     n_runs = 20
     auroc_scores = []
+    
+    # Convert the features and labels to NumPy once; each run then only gathers its split rows
+    X_arr = np.ascontiguousarray(X[feature_names].to_numpy(dtype=np.float32))
+    y_arr = y.to_numpy(dtype=np.int8)
+    row_idx = np.arange(X_arr.shape[0])
 
     for i in range(n_runs):
-        # Split the data with a different random seed
-        X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=i)
+        # Split the row positions with a different random seed
+        train_idx, test_idx = train_test_split(row_idx, test_size=0.2, random_state=i)
+        y_test = y_arr[test_idx]
 
         # Convert to Dask arrays for training
-        X_train_da = da.from_array(X_train.values, chunks="auto")
-        y_train_da = da.from_array(y_train.values, chunks="auto")
+        X_train_da = da.from_array(X_arr[train_idx], chunks="auto")
+        y_train_da = da.from_array(y_arr[train_idx], chunks="auto")
 
         # Convert test set to DMatrix for prediction (local)
-        dtest = xgb.DMatrix(X_test, label=y_test)
+        dtest = xgb.DMatrix(X_arr[test_idx], label=y_test, feature_names=feature_names)
 
         # Train using Dask
-        dtrain = xgb.dask.DaskDMatrix(client, X_train_da, y_train_da, feature_names=feature_names)
+        dtrain = xgb.dask.DaskQuantileDMatrix(client, X_train_da, y_train_da, feature_names=feature_names)
         params = {
             "objective": "binary:logistic",
             "eval_metric": "logloss",
@@ -550,9 +567,10 @@ def plot_overlapping_roc_pr_curves(X_dd, y_dd, feature_names, fig_dir, n_runs=10
         booster = train_xgboost_dask(X_train_dd, y_train_dd, feature_names)
         clf = xgb_classifier_from_booster(booster, feature_names)
 
-        X_test = X_test_dd.compute()
+        # Predict on a C-contiguous float32 array in the booster's feature order
+        X_test = np.ascontiguousarray(X_test_dd[feature_names].compute().to_numpy(dtype=np.float32))
         y_test = y_test_dd.compute()
-        y_pred_prob = clf.predict_proba(X_test)[:, 1]
+        y_pred_prob = clf.predict_proba(X_test, validate_features=False)[:, 1]
 
         return y_test.to_numpy(), y_pred_prob
 
@@ -602,15 +620,21 @@ def plot_feature_ablation(feature_names, X_train, X_test, y_train, y_test, full_
     
     os.makedirs(fig_dir, exist_ok=True)
 
-    # Evaluate full model AUROC
-    y_pred_prob_full = full_model.predict_proba(X_test)[:, 1]
+    # Evaluate full model AUROC on a C-contiguous float32 array in the model's feature order
+    full_model_features = full_model.get_booster().feature_names or feature_names
+    X_test_full = np.ascontiguousarray(X_test[full_model_features].to_numpy(dtype=np.float32))
+    y_pred_prob_full = full_model.predict_proba(X_test_full, validate_features=False)[:, 1]
     full_auroc = roc_auc_score(y_test, y_pred_prob_full)
     logging.info(f"\t\tFull model AUROC: {full_auroc:.4f}")
 
-    def evaluate_feature_removal(feature):
-        features_subset = [f for f in feature_names if f != feature]
-        X_train_subset = X_train[features_subset]
-        X_test_subset = X_test[features_subset]
+    # Convert the feature columns to float32 arrays once; each ablation then drops one
+    # column by position instead of re-selecting the remaining columns by label
+    X_train_arr = np.ascontiguousarray(X_train[feature_names].to_numpy(dtype=np.float32))
+    X_test_arr = np.ascontiguousarray(X_test[feature_names].to_numpy(dtype=np.float32))
+    feature_idx = np.arange(len(feature_names))
+
+    def evaluate_feature_removal(removed_idx):
+        keep_idx = np.delete(feature_idx, removed_idx)
 
         model = xgb.XGBClassifier(
             random_state=42,
@@ -624,15 +648,15 @@ def plot_feature_ablation(feature_names, X_train, X_test, y_train, y_test, full_
             eval_metric='logloss',
             use_label_encoder=False
         )
-        model.fit(X_train_subset, y_train)
-        y_pred = model.predict_proba(X_test_subset)[:, 1]
+        model.fit(X_train_arr[:, keep_idx], y_train)
+        y_pred = model.predict_proba(X_test_arr[:, keep_idx])[:, 1]
         auroc = roc_auc_score(y_test, y_pred)
-        return feature, auroc
+        return feature_names[removed_idx], auroc
 
     # Run in parallel
     results = Parallel(n_jobs=n_jobs)(
-        delayed(evaluate_feature_removal)(feature)
-        for feature in feature_names
+        delayed(evaluate_feature_removal)(i)
+        for i in range(len(feature_names))
     )
 
     # Sort and plot results
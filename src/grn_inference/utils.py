@@ -4,6 +4,8 @@ import logging
 import csv
 import os
 import pybedtools
+import pyarrow as pa
+import pyarrow.csv as pa_csv
 from pandas.api.types import is_numeric_dtype
 
 from typing import Union
@@ -14,6 +16,46 @@ def read_ground_truth(ground_truth_file):
     ground_truth = ground_truth.rename(columns={"Source": "source_id", "Target": "target_id"})
     return ground_truth
 
+def edges_in_ground_truth(
+    source_ids: pd.Series, 
+    target_ids: pd.Series, 
+    ground_truth_source_ids: pd.Series, 
+    ground_truth_target_ids: pd.Series
+    ) -> np.ndarray:
+    """
+    Returns a boolean array marking which TF-TG edges are present in the ground truth.
+    
+    The TFs and TGs are factorized over the union of both edge lists so that each edge
+    packs into a single int64 key, and membership is tested with `np.isin` on those keys.
+
+    Args:
+        source_ids (pd.Series): TF gene names of the edges to test
+        target_ids (pd.Series): TG gene names of the edges to test
+        ground_truth_source_ids (pd.Series): TF gene names of the ground truth edges
+        ground_truth_target_ids (pd.Series): TG gene names of the ground truth edges
+
+    Returns:
+        in_ground_truth (np.ndarray): 
+            Boolean array with one value per edge in `source_ids` / `target_ids`
+    """
+    n_edges = len(source_ids)
+    
+    tf_codes, _ = pd.factorize(np.concatenate([
+        source_ids.to_numpy(dtype=object), ground_truth_source_ids.to_numpy(dtype=object)
+    ]))
+    tg_codes, _ = pd.factorize(np.concatenate([
+        target_ids.to_numpy(dtype=object), ground_truth_target_ids.to_numpy(dtype=object)
+    ]))
+    
+    edge_keys = (tf_codes.astype(np.int64) << 32) | tg_codes.astype(np.int64)
+    
+    # Missing names factorize to -1, make sure they never match
+    edge_keys[(tf_codes < 0) | (tg_codes < 0)] = -1
+    ground_truth_keys = edge_keys[n_edges:]
+    ground_truth_keys = ground_truth_keys[ground_truth_keys >= 0]
+    
+    return np.isin(edge_keys[:n_edges], ground_truth_keys)
+
 def label_edges_with_ground_truth(df_to_label: pd.DataFrame, ground_truth_df: pd.DataFrame) -> pd.DataFrame:
     """
     Creates a "label" column with 1 if the TF-TG edge is present in the ground truth, else 0.
@@ -45,10 +87,8 @@ def label_edges_with_ground_truth(df_to_label: pd.DataFrame, ground_truth_df: pd
             raise KeyError(f"'{col}' column not found in the ground truth DataFrame")
     
     logging.info("Creating ground truth set")
-    ground_truth_pairs = set(zip(
-        ground_truth_df["source_id"].str.upper(),
-        ground_truth_df["target_id"].str.upper()
-    ))
+    ground_truth_tfs = ground_truth_df["source_id"].str.upper()
+    ground_truth_tgs = ground_truth_df["target_id"].str.upper()
 
     logging.info("Adding labels to inferred network")
     
@@ -59,8 +99,9 @@ def label_edges_with_ground_truth(df_to_label: pd.DataFrame, ground_truth_df: pd
         if isinstance(df, pd.Series):
             raise ValueError("Expected DataFrame but got Series — check apply usage.")
         df = df.copy()  # <-- avoids SettingWithCopyWarning
-        tf_tg_tuples = list(zip(df["source_id"], df["target_id"]))
-        df.loc[:, "label"] = [1 if pair in ground_truth_pairs else 0 for pair in tf_tg_tuples]
+        df["label"] = edges_in_ground_truth(
+            df["source_id"], df["target_id"], ground_truth_tfs, ground_truth_tgs
+        ).astype(np.int8)
         return df
 
     labeled_df = label_partition(df_to_label)
@@ -146,16 +187,21 @@ def merge_dataset_with_ground_truth(
     
     return df_labeled
 
-def load_dataset(dataset_file_path: str) -> pd.DataFrame:
+def load_dataset(dataset_file_path: str, value_dtype: Union[str, None] = None) -> pd.DataFrame:
     """
     Loads a dataset from a csv, tsv, or parquet file.
     
     **csv and tsv files**:
     - header = row 0
     - index = None
+    - parsed with the multithreaded pyarrow engine
 
     Args:
         dataset_file_path (str): Path to the dataset file to open.
+        value_dtype (str, optional): 
+            If set, every column after the first (ID) column is loaded as this dtype 
+            (e.g. "float32"). csv and tsv values are parsed directly into it rather than 
+            materializing a float64 copy first.
 
     Raises:
         ValueError: Data file must be .csv, .tsv, or parquet
@@ -170,15 +216,25 @@ def load_dataset(dataset_file_path: str) -> pd.DataFrame:
     assert dataset_file_path.lower().endswith((".csv", ".tsv", ".parquet")), \
         "`dataset_file_path` must end with .csv, .tsv. or .parquet"
     
+    def read_delimited(sep: str) -> pd.DataFrame:
+        dtype = None
+        if value_dtype is not None:
+            header = pd.read_csv(dataset_file_path, sep=sep, header=0, nrows=0).columns
+            dtype = {col: value_dtype for col in header[1:]}
+        return pd.read_csv(dataset_file_path, sep=sep, header=0, index_col=None, dtype=dtype, engine="pyarrow")
+    
     df: pd.DataFrame = pd.DataFrame()
     if dataset_file_path.lower().endswith('.parquet'):
         df = pd.read_parquet(dataset_file_path)
+        if value_dtype is not None:
+            value_cols = df.columns[1:]
+            df[value_cols] = df[value_cols].astype(value_dtype)
         
     elif dataset_file_path.lower().endswith('.csv'):
-        df = pd.read_csv(dataset_file_path, sep=",", header=0, index_col=None)
+        df = read_delimited(sep=",")
         
     elif dataset_file_path.lower().endswith('.tsv'):
-        df = pd.read_csv(dataset_file_path, sep="\t", header=0, index_col=None)
+        df = read_delimited(sep="\t")
         
     else:
         raise ValueError(f"Data file must be .csv, .tsv or .parquet: got {dataset_file_path}")
@@ -188,7 +244,7 @@ def load_dataset(dataset_file_path: str) -> pd.DataFrame:
     
     return df
 
-def load_atac_dataset(atac_data_file: str) -> pd.DataFrame:
+def load_atac_dataset(atac_data_file: str, value_dtype: Union[str, None] = None) -> pd.DataFrame:
     """
     Loads an ATAC-seq dataset from a csv, tsv, or parquet file
     
@@ -198,13 +254,14 @@ def load_atac_dataset(atac_data_file: str) -> pd.DataFrame:
 
     Args:
         atac_data_file (str): Path to the scATAC-seq csv, tsv, or parquet file
+        value_dtype (str, optional): dtype to load the peak x cell values as (e.g. "float32")
 
     Returns:
         df (pd.DataFrame): 
             DataFrame where column 0 = `"peak_id"` and row 0 as the header
     """
     
-    df = load_dataset(atac_data_file)
+    df = load_dataset(atac_data_file, value_dtype=value_dtype)
     
     df = df.rename(columns={df.columns[0]: "peak_id"})
     
@@ -213,7 +270,7 @@ def load_atac_dataset(atac_data_file: str) -> pd.DataFrame:
     
     return df
 
-def load_rna_dataset(rna_data_file: str) -> pd.DataFrame:
+def load_rna_dataset(rna_data_file: str, value_dtype: Union[str, None] = None) -> pd.DataFrame:
     """
     Loads an RNA-seq dataset from a csv, tsv, or parquet file.
     
@@ -223,13 +280,14 @@ def load_rna_dataset(rna_data_file: str) -> pd.DataFrame:
 
     Args:
         rna_data_file (str): Path to the scRNA-seq csv, tsv, or parquet file
+        value_dtype (str, optional): dtype to load the gene x cell values as (e.g. "float32")
 
     Returns:
         df (pd.DataFrame): 
             DataFrame where column 0 = `"gene_id"` and row 0 as the header
     """
     
-    df = load_dataset(rna_data_file)
+    df = load_dataset(rna_data_file, value_dtype=value_dtype)
     
     df = df.rename(columns={df.columns[0]: "gene_id"})
     
@@ -385,26 +443,25 @@ def find_genes_near_peaks(
     
     
     # Define the column types for conversion to DataFrame
-    dtype_dict = {
-        "peak_chr": str,
-        "peak_start": int,
-        "peak_end": int,
-        "peak_id": str,
-        "gene_chr": str,
-        "gene_start": int,
-        "gene_end": int,
-        "gene_id": str
+    column_types = {
+        "peak_chr": pa.string(),
+        "peak_start": pa.int64(),
+        "peak_end": pa.int64(),
+        "peak_id": pa.string(),
+        "gene_chr": pa.string(),
+        "gene_start": pa.int64(),
+        "gene_end": pa.int64(),
+        "gene_id": pa.string()
     }
     
-    # Convert the BedTool result to a DataFrame for further processing.
-    peak_tss_overlap_df = peak_tss_overlap.to_dataframe(
-        names = [
-            "peak_chr", "peak_start", "peak_end", "peak_id",
-            "gene_chr", "gene_start", "gene_end", "gene_id"
-        ],
-        dtype=dtype_dict,
-        low_memory=False  # ensures the entire file is read in one go
-    ).rename(columns={"gene_id": "target_id"}).dropna()
+    # Parse the BedTool result with Arrow's multithreaded CSV reader and a fixed schema,
+    # which is much faster than BedTool.to_dataframe's pandas parse on large window outputs
+    peak_tss_overlap_df = pa_csv.read_csv(
+        peak_tss_overlap.fn,
+        read_options=pa_csv.ReadOptions(column_names=list(column_types)),
+        parse_options=pa_csv.ParseOptions(delimiter="\t"),
+        convert_options=pa_csv.ConvertOptions(column_types=column_types, strings_can_be_null=True)
+    ).to_pandas().rename(columns={"gene_id": "target_id"}).dropna()
         
     # Calculate the absolute distance in basepairs between the peak's end and gene's start.
     distances = np.abs(peak_tss_overlap_df["peak_end"].values - peak_tss_overlap_df["gene_start"].values)
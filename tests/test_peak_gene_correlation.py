@@ -0,0 +1,139 @@
+import os
+import sys
+import numpy as np
+import scipy.sparse as sp
+from scipy import stats
+import pytest
+
+# Ensure the src directory is on the Python path so grn_inference can be imported
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "src")))
+
+from grn_inference.pipeline.peak_gene_correlation import (
+    normalize_csr_rows,
+    row_normalize_sparse,
+    sparse_row_dots,
+    critical_r_squared,
+)
+
+
+def zscore_rows(X):
+    return (X - X.mean(axis=1, keepdims=True)) / X.std(axis=1, keepdims=True)
+
+
+def test_sparse_row_dots_matches_dense_corrcoef():
+    rng = np.random.default_rng(0)
+    n_cells = 40
+    atac = rng.normal(size=(6, n_cells))
+    rna = rng.normal(size=(5, n_cells))
+
+    # Population z-scored rows with the 1 / n scaling folded into the RNA side dot to Pearson r
+    X = sp.csr_matrix(zscore_rows(atac))
+    Y = sp.csr_matrix(zscore_rows(rna) / n_cells)
+    peak_rows, gene_rows = np.meshgrid(np.arange(6), np.arange(5), indexing="ij")
+    peak_rows, gene_rows = peak_rows.ravel(), gene_rows.ravel()
+
+    kept_pos, r = sparse_row_dots(
+        X.indptr, X.indices, X.data, Y.indptr, Y.indices, Y.data,
+        peak_rows, gene_rows, -1.0
+    )
+
+    expected = np.corrcoef(atac, rna)[:6, 6:][peak_rows, gene_rows]
+    np.testing.assert_array_equal(kept_pos, np.arange(len(peak_rows)))
+    np.testing.assert_allclose(r, expected, rtol=1e-10, atol=1e-12)
+
+
+def test_sparse_row_dots_intersects_sparse_rows_and_applies_threshold():
+    X = sp.random(30, 50, density=0.2, random_state=1, format="csr")
+    Y = sp.random(20, 50, density=0.2, random_state=2, format="csr")
+    X.sort_indices()
+    Y.sort_indices()
+    rng = np.random.default_rng(3)
+    x_rows = rng.integers(0, 30, size=200)
+    y_rows = rng.integers(0, 20, size=200)
+
+    expected = np.einsum("ij,ij->i", X.toarray()[x_rows], Y.toarray()[y_rows])
+    min_square = np.quantile(expected ** 2, 0.5)
+
+    kept_pos, dots = sparse_row_dots(
+        X.indptr, X.indices, X.data, Y.indptr, Y.indices, Y.data,
+        x_rows, y_rows, min_square
+    )
+
+    np.testing.assert_array_equal(kept_pos, np.flatnonzero(expected ** 2 > min_square))
+    np.testing.assert_allclose(dots, expected[kept_pos])
+
+
+def test_sparse_row_dots_drops_nan_results():
+    X = sp.csr_matrix(np.array([[np.nan, 1.0], [1.0, 1.0]]))
+    Y = sp.csr_matrix(np.array([[1.0, 1.0]]))
+
+    kept_pos, dots = sparse_row_dots(
+        X.indptr, X.indices, X.data, Y.indptr, Y.indices, Y.data,
+        np.array([0, 1]), np.array([0, 0]), -1.0
+    )
+
+    np.testing.assert_array_equal(kept_pos, [1])
+    np.testing.assert_allclose(dots, [2.0])
+
+
+def test_normalize_csr_rows_matches_dense_zscore_on_stored_values():
+    dense = np.array([
+        [1.0, 0.0, 3.0, 0.0, 2.0],
+        [0.0, 4.0, 0.0, 0.0, 1.0],
+    ])
+    X = sp.csr_matrix(dense)
+
+    X_norm = row_normalize_sparse(X)
+
+    expected = zscore_rows(dense)
+    expected[dense == 0] = 0
+    np.testing.assert_allclose(X_norm.toarray(), expected)
+
+
+def test_normalize_csr_rows_zero_variance_and_nan_rows():
+    data = np.array([
+        2.0, 2.0, 2.0,   # constant across every column -> zero variance
+        1.0, np.nan,     # contains a NaN -> stays NaN
+    ])
+    indptr = np.array([0, 3, 3, 5])  # the middle row stores nothing
+    indices = np.array([0, 1, 2, 0, 2])
+
+    normalize_csr_rows(indptr, data, 3)
+
+    np.testing.assert_array_equal(data[:3], 0.0)
+    assert np.isnan(data[3:]).all()
+
+
+def test_row_normalize_sparse_keeps_float32_and_input():
+    X = sp.csr_matrix(np.array([[1, 0, 2], [0, 0, 0], [5, 5, 5]], dtype=np.float32))
+    original = X.data.copy()
+
+    X_norm = row_normalize_sparse(X)
+
+    assert X_norm.dtype == np.float32
+    np.testing.assert_array_equal(X.data, original)
+    np.testing.assert_array_equal(X_norm.toarray()[2], 0.0)
+
+
+@pytest.mark.parametrize("n", [10, 50, 500])
+@pytest.mark.parametrize("alpha", [0.05, 0.01, 1e-4])
+def test_critical_r_squared_matches_pearsonr_pvalues(n, alpha):
+    min_r_squared = critical_r_squared(alpha, n)
+
+    # A correlation exactly at the threshold has a two-sided p-value of alpha
+    r_crit = np.sqrt(min_r_squared)
+    t_crit = r_crit * np.sqrt((n - 2) / (1 - min_r_squared))
+    assert 2 * stats.t.sf(t_crit, df=n - 2) == pytest.approx(alpha, rel=1e-8)
+
+    # And the r^2 cutoff keeps the same pairs as filtering pearsonr p-values on alpha
+    rng = np.random.default_rng(n)
+    x = rng.normal(size=n)
+    noise_scales = np.geomspace(0.05, 50, 200)
+    kept_by_threshold, kept_by_pvalue = [], []
+    for scale in noise_scales:
+        y = x + scale * rng.normal(size=n)
+        r, p = stats.pearsonr(x, y)
+        kept_by_threshold.append(r ** 2 > min_r_squared)
+        kept_by_pvalue.append(p < alpha)
+
+    assert kept_by_threshold == kept_by_pvalue
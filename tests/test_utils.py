@@ -0,0 +1,57 @@
+import os
+import sys
+import numpy as np
+import pandas as pd
+
+# Ensure the src directory is on the Python path so grn_inference can be imported
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "src")))
+
+from grn_inference.utils import edges_in_ground_truth
+
+
+def test_edges_in_ground_truth_marks_matching_pairs():
+    edges = pd.DataFrame({
+        "source_id": ["Sox2", "Sox2", "Pou5f1", "Nanog"],
+        "target_id": ["Nanog", "Klf4", "Sox2", "Sox2"],
+    })
+    ground_truth = pd.DataFrame({
+        "source_id": ["Sox2", "Pou5f1", "Gata1"],
+        "target_id": ["Nanog", "Sox2", "Tal1"],
+    })
+
+    result = edges_in_ground_truth(
+        edges["source_id"], edges["target_id"],
+        ground_truth["source_id"], ground_truth["target_id"]
+    )
+
+    np.testing.assert_array_equal(result, [True, False, True, False])
+
+
+def test_edges_in_ground_truth_ignores_reversed_pairs():
+    # Nanog -> Sox2 is only in the ground truth as Sox2 -> Nanog
+    result = edges_in_ground_truth(
+        pd.Series(["Nanog"]), pd.Series(["Sox2"]),
+        pd.Series(["Sox2"]), pd.Series(["Nanog"])
+    )
+
+    np.testing.assert_array_equal(result, [False])
+
+
+def test_edges_in_ground_truth_unmatched_and_missing_ids():
+    edges_source = pd.Series(["Unknown1", "Sox2", None, "Sox2"])
+    edges_target = pd.Series(["Nanog", "Unknown2", "Nanog", None])
+    ground_truth_source = pd.Series(["Sox2", None])
+    ground_truth_target = pd.Series(["Nanog", "Nanog"])
+
+    result = edges_in_ground_truth(edges_source, edges_target, ground_truth_source, ground_truth_target)
+
+    np.testing.assert_array_equal(result, [False, False, False, False])
+
+
+def test_edges_in_ground_truth_empty_ground_truth():
+    result = edges_in_ground_truth(
+        pd.Series(["Sox2"]), pd.Series(["Nanog"]),
+        pd.Series([], dtype=object), pd.Series([], dtype=object)
+    )
+
+    np.testing.assert_array_equal(result, [False])